@@ -0,0 +1,148 @@
+# A local stand-in for the OpenAI chat completions endpoint, so the LLM queue can be exercised
+# without an API key. It enforces a requests-per-minute limit with 429s the way OpenAI does, can
+# fail a share of calls with 503s, and streams answers as server-sent events. Run it and point
+# the app at it with base_url = "http://127.0.0.1:8099/v1" under [openai] in the secrets:
+#   python -m benchmarks.fake_openai --port 8099 --rpm 60 --error-rate 0.1
+# --window shortens the rate limit's minute, so a benchmark can hit it without waiting minutes.
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = "Sessions from organic search grew, so keep publishing the recipe guides that bring them in."
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # rpm requests are accepted per window seconds
+    def __init__(self, address, rpm=None, error_rate=0.0, latency=0.05, window=60.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.rpm = rpm
+        self.window = window
+        self.error_rate = error_rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.accepted = deque()
+        self.stats = {"requests": 0, "rate_limited": 0, "failed": 0, "completed": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    # None when the call may go ahead, otherwise (status, seconds to wait, error body)
+    def admit(self):
+        with self.lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+
+            if self.rpm is not None and len(self.accepted) >= self.rpm:
+                self.stats["rate_limited"] += 1
+                wait = self.window - (now - self.accepted[0])
+                return 429, wait, {"message": f"Rate limit reached: limit {self.rpm} requests per {self.window:g}s.",
+                                   "type": "requests", "code": "rate_limit_exceeded"}
+            if random.random() < self.error_rate:
+                self.stats["failed"] += 1
+                return 503, None, {"message": "The server is overloaded.", "type": "server_error", "code": None}
+
+            self.accepted.append(now)
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+            return None
+
+    def finish(self):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+            self.stats["completed"] += 1
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        refusal = self.server.admit()
+        if refusal is not None:
+            status, wait, error = refusal
+            headers = {"retry-after-ms": str(int(wait * 1000))} if wait is not None else {}
+            self.send_json(status, {"error": error}, headers)
+            return
+
+        try:
+            time.sleep(self.server.latency)
+            prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+            words = ANSWER.split(" ")
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+            model = body.get("model", "gpt-4o-mini")
+            if body.get("stream"):
+                self.stream_answer(model, words, usage, body.get("stream_options") or {})
+            else:
+                self.send_json(200, {
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": ANSWER}}],
+                    "usage": usage,
+                })
+        finally:
+            self.server.finish()
+
+    def stream_answer(self, model, words, usage, stream_options):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send(choices, **extra):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        for i, word in enumerate(words):
+            send([{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}])
+        send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if stream_options.get("include_usage"):
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+# Serve on a background thread; returns the server and the base_url to give the OpenAI client
+def start_fake_openai(port=0, rpm=None, error_rate=0.0, latency=0.05, window=60.0):
+    server = FakeOpenAIServer(("127.0.0.1", port), rpm=rpm, error_rate=error_rate, latency=latency, window=window)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake of the OpenAI chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--rpm", type=int, help="requests per minute before answering 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failed with a 503")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each answer")
+    parser.add_argument("--window", type=float, default=60.0, help="seconds the --rpm limit applies to (default 60)")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(("127.0.0.1", args.port), rpm=args.rpm, error_rate=args.error_rate, latency=args.latency,
+                              window=args.window)
+    print(f"Fake OpenAI endpoint on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
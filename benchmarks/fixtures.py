@@ -0,0 +1,319 @@
+# Synthetic GA4, Search Console and Google Ads payloads plus stub clients that serve them,
+# so the data paths can be exercised at any scale without credentials or network access
+import random
+import threading
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from google.analytics.data_v1beta.types import RunReportResponse, BatchRunReportsResponse, MetricType
+
+import clients
+from ga4_data_pull import REPORT_SPECS, decode_report, shape_frame
+from gaw_data_pull import API_VERSION
+
+INTEGER_METRICS = {"activeUsers", "sessions", "screenPageViews", "newUsers", "eventCount"}
+
+# Synthetic values depend on the metric, not its position, so every request shape sees the same data
+METRIC_SEEDS = {name: seed for seed, name in enumerate(["activeUsers", "sessions", "screenPageViews", "bounceRate",
+                                                        "averageSessionDuration", "newUsers", "eventCount"])}
+
+SOURCES = ["google", "(direct)", "bing", "facebook.com", "instagram.com", "linkedin.com", "yelp.com", "duckduckgo"]
+EVENTS = ["page_view", "session_start", "first_visit", "user_engagement", "scroll", "click", "generate_lead"]
+DEVICES = ["DESKTOP", "MOBILE", "TABLET"]
+
+
+def dimension_value(name, row, day):
+    if name == "date":
+        return day.strftime("%Y%m%d")
+    if name == "sessionSource":
+        return SOURCES[row % len(SOURCES)] if row < len(SOURCES) else f"referral-{row}.example.com"
+    if name == "eventName":
+        return EVENTS[row % len(EVENTS)] if row < len(EVENTS) else f"custom_event_{row}"
+    return "/contact" if row == 0 else f"/page-{row}"
+
+
+# Rows offset..offset+limit of a report with n_rows rows spread evenly over the date range.
+# Row i is always the same, so pages of the same report line up exactly. dimension_filter is an exact
+# (dimension, value) match, keeping only the rows of the matching groups.
+def build_run_report_response(dimensions, metrics, start_date, end_date, n_rows, offset=0, limit=0, dimension_filter=None):
+    response = RunReportResponse()
+    raw = RunReportResponse.pb(response)
+    for name in dimensions:
+        raw.dimension_headers.add(name=name)
+    for name in metrics:
+        raw.metric_headers.add(name=name, type_=MetricType.TYPE_INTEGER if name in INTEGER_METRICS else MetricType.TYPE_FLOAT)
+
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    n_days = (end - start).days + 1
+
+    # Every dimension but the date is derived from the row's group, so filters keep whole groups
+    indices = range(n_rows)
+    if dimension_filter:
+        field_name, value = dimension_filter
+        kept = [g for g in range(-(-n_rows // n_days)) if dimension_value(field_name, g, start) == value]
+        indices = [i for g in kept for i in range(g * n_days, min((g + 1) * n_days, n_rows))]
+
+    stop = min(offset + limit, len(indices)) if limit else len(indices)
+    raw.row_count = len(indices)
+
+    for i in indices[offset:stop]:
+        day = start + timedelta(days=i % n_days)
+        row = raw.rows.add()
+        for name in dimensions:
+            row.dimension_values.add(value=dimension_value(name, i // n_days, day))
+        for name in metrics:
+            seed = METRIC_SEEDS[name]
+            if name in INTEGER_METRICS:
+                row.metric_values.add(value=str((i * 7919 + seed * 104729) % 5000))
+            else:
+                row.metric_values.add(value=repr(((i * 104729 + seed * 7919) % 100000) / 1000))
+
+    return response
+
+
+# The daily rows of build_run_report_response summed per group over each requested date range, the way
+# GA4 answers a report without the date dimension. Counts are summed and averages/rates averaged; the
+# stub has no notion of individual users, so activeUsers is summed like any other count.
+def build_aggregated_response(request, n_rows):
+    dimensions = [dimension.name for dimension in request.dimensions]
+    metrics = [metric.name for metric in request.metrics]
+    multiple_ranges = len(request.date_ranges) > 1
+
+    response = RunReportResponse()
+    raw = RunReportResponse.pb(response)
+    for name in dimensions + (["dateRange"] if multiple_ranges else []):
+        raw.dimension_headers.add(name=name)
+    for name in metrics:
+        raw.metric_headers.add(name=name, type_=MetricType.TYPE_INTEGER if name in INTEGER_METRICS else MetricType.TYPE_FLOAT)
+
+    field_filter = request.dimension_filter.filter
+    rows, totals = [], []
+    i = np.arange(n_rows)
+
+    for k, date_range in enumerate(request.date_ranges):
+        range_name = date_range.name or f"date_range_{k}"
+        start, end = date.fromisoformat(date_range.start_date), date.fromisoformat(date_range.end_date)
+        n_days = (end - start).days + 1
+        groups = i // n_days
+        n_groups = int(groups.max()) + 1 if n_rows else 0
+
+        # Every dimension of a row is derived from its group, so filtering and grouping work per group
+        kept = np.ones(n_groups, dtype=bool)
+        if field_filter.field_name:
+            kept = np.array([dimension_value(field_filter.field_name, g, start) == field_filter.string_filter.value for g in range(n_groups)], dtype=bool)
+        row_kept = kept[groups] if n_groups else np.zeros(0, dtype=bool)
+        if not dimensions:
+            groups = np.zeros(n_rows, dtype=np.int64)
+            n_groups = 1 if row_kept.any() else 0
+            kept = np.ones(n_groups, dtype=bool)
+
+        counts = np.bincount(groups[row_kept], minlength=n_groups)
+        values = []
+        for name in metrics:
+            seed = METRIC_SEEDS[name]
+            if name in INTEGER_METRICS:
+                daily = (i * 7919 + seed * 104729) % 5000
+            else:
+                daily = ((i * 104729 + seed * 7919) % 100000) / 1000
+            sums = np.bincount(groups[row_kept], weights=daily[row_kept], minlength=n_groups)
+            total = daily[row_kept].sum()
+            if name in INTEGER_METRICS:
+                values.append((sums.astype(np.int64), str(int(total))))
+            else:
+                values.append((sums / np.maximum(counts, 1), repr(total / max(row_kept.sum(), 1))))
+
+        for g in np.flatnonzero(kept & (counts > 0)):
+            keys = [dimension_value(name, int(g), start) for name in dimensions] + ([range_name] if multiple_ranges else [])
+            rows.append((keys, [str(column[g]) if name in INTEGER_METRICS else repr(float(column[g])) for name, (column, _) in zip(metrics, values)]))
+
+        if request.metric_aggregations:
+            totals.append((["RESERVED_TOTAL"] * len(dimensions) + ([range_name] if multiple_ranges else []), [total for _, total in values]))
+
+    raw.row_count = len(rows)
+    stop = request.offset + request.limit if request.limit else len(rows)
+    for target, selected in ((raw.rows, rows[request.offset:stop]), (raw.totals, totals)):
+        for keys, metric_values in selected:
+            row = target.add()
+            for key in keys:
+                row.dimension_values.add(value=key)
+            for value in metric_values:
+                row.metric_values.add(value=value)
+
+    return response
+
+
+# Stands in for BetaAnalyticsDataClient: every report has rows_per_report daily rows.
+# With tokens_per_hour set it enforces a GA4-style property quota: each report costs tokens by rows
+# returned, calls beyond max_concurrent or the hourly tokens fail with ResourceExhausted, and
+# error_rate of calls fail with ServiceUnavailable. The hour never refills.
+class StubGA4Client:
+    def __init__(self, rows_per_report, tokens_per_hour=None, max_concurrent=10, error_rate=0.0):
+        self.rows_per_report = rows_per_report
+        self.tokens_remaining = tokens_per_hour
+        self.max_concurrent = max_concurrent
+        self.error_rate = error_rate
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def build_report(self, request):
+        # Reports without the date dimension, with totals or over several ranges are aggregated
+        dimensions = [dimension.name for dimension in request.dimensions]
+        if "date" not in dimensions or len(request.date_ranges) > 1 or request.metric_aggregations:
+            return build_aggregated_response(request, self.rows_per_report)
+
+        field_filter = request.dimension_filter.filter
+        date_range = request.date_ranges[0]
+        return build_run_report_response(
+            dimensions,
+            [metric.name for metric in request.metrics],
+            date_range.start_date, date_range.end_date,
+            self.rows_per_report, offset=request.offset, limit=request.limit,
+            dimension_filter=(field_filter.field_name, field_filter.string_filter.value) if field_filter.field_name else None,
+        )
+
+    # Run the reports of one call under the simulated quota
+    def call(self, requests):
+        from google.api_core import exceptions
+
+        with self.lock:
+            self.calls += 1
+            if self.tokens_remaining is not None and (self.in_flight >= self.max_concurrent or self.tokens_remaining <= 0):
+                raise exceptions.ResourceExhausted("Exhausted property tokens or concurrent requests quota")
+            if random.random() < self.error_rate:
+                raise exceptions.ServiceUnavailable("The service is currently unavailable")
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        try:
+            reports = [self.build_report(request) for request in requests]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        if self.tokens_remaining is not None:
+            with self.lock:
+                for request, report in zip(requests, reports):
+                    cost = 10 + len(report.rows) // 100
+                    self.tokens_remaining -= cost
+                    if request.return_property_quota:
+                        quota = RunReportResponse.pb(report).property_quota
+                        quota.tokens_per_hour.consumed = cost
+                        quota.tokens_per_hour.remaining = max(self.tokens_remaining, 0)
+        return reports
+
+    def run_report(self, request):
+        return self.call([request])[0]
+
+    def batch_run_reports(self, request):
+        return BatchRunReportsResponse(reports=self.call(list(request.requests)))
+
+
+# Search Analytics rows startRow..startRow+rowLimit of a result with n_rows rows
+def build_search_analytics_rows(body, n_rows):
+    start = date.fromisoformat(body["startDate"])
+    n_days = (date.fromisoformat(body["endDate"]) - start).days + 1
+    first = body.get("startRow", 0)
+    rows = []
+    for i in range(first, min(first + body.get("rowLimit", 1000), n_rows)):
+        keys = []
+        for dimension in body["dimensions"]:
+            if dimension == "query":
+                keys.append(f"synthetic search query {i}")
+            elif dimension == "page":
+                keys.append(f"https://example.com/page-{i % 1000}")
+            elif dimension == "date":
+                keys.append((start + timedelta(days=i % n_days)).isoformat())
+            elif dimension == "device":
+                keys.append(DEVICES[i % len(DEVICES)])
+            else:
+                keys.append("usa")
+        impressions = (i * 7919) % 5000 + 1
+        clicks = impressions * ((i % 7) + 1) // 50
+        rows.append({"keys": keys, "clicks": clicks, "impressions": impressions,
+                     "ctr": clicks / impressions, "position": 1 + (i * 104729) % 1000 / 10})
+    return {"rows": rows} if rows else {}
+
+
+# Stands in for the discovery-built searchconsole service
+class StubSearchConsoleService:
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+
+    def searchanalytics(self):
+        return self
+
+    def query(self, siteUrl, body):
+        n_rows = self.n_rows
+        return SimpleNamespace(execute=lambda http=None: build_search_analytics_rows(body, n_rows))
+
+
+def keyword_idea(text, i):
+    metrics = SimpleNamespace(
+        avg_monthly_searches=(i * 7919) % 10000,
+        competition=SimpleNamespace(name=["LOW", "MEDIUM", "HIGH"][i % 3]),
+        low_top_of_page_bid_micros=(i * 104729) % 2000000,
+        high_top_of_page_bid_micros=(i * 104729) % 2000000 + 1000000,
+    )
+    return SimpleNamespace(text=text, keyword_idea_metrics=metrics, keyword_metrics=metrics, close_variants=[])
+
+
+# Stands in for GoogleAdsClient and its KeywordPlanIdeaService; each seed suggests ideas_per_seed
+# ideas, half of them shared with every other seed so deduplication has work to do
+class StubAdsClient:
+    def __init__(self, ideas_per_seed):
+        self.ideas_per_seed = ideas_per_seed
+
+    def get_type(self, name):
+        return SimpleNamespace(
+            customer_id=None, language=None, geo_target_constants=[], keywords=[],
+            url_seed=SimpleNamespace(url=None), keyword_seed=SimpleNamespace(keywords=[]),
+        )
+
+    def get_service(self, name):
+        return self
+
+    def language_constant_path(self, language_id):
+        return f"languageConstants/{language_id}"
+
+    def geo_target_constant_path(self, location_id):
+        return f"geoTargetConstants/{location_id}"
+
+    def generate_keyword_ideas(self, request):
+        seed = request.url_seed.url or request.keyword_seed.keywords[0]
+        shared = self.ideas_per_seed // 2
+        return [keyword_idea(f"shared idea {i}", i) for i in range(shared)] + [
+            keyword_idea(f"{seed} idea {i}", i) for i in range(self.ideas_per_seed - shared)
+        ]
+
+    def generate_keyword_historical_metrics(self, request):
+        return SimpleNamespace(results=[keyword_idea(keyword, i) for i, keyword in enumerate(request.keywords)])
+
+
+# Route the app's default GA4, Search Console and Ads clients to stubs of the given size
+def install_stub_clients(n_rows):
+    clients.shared_clients.update({
+        "ga4": StubGA4Client(n_rows),
+        "ga4_property_id": "0",
+        "search_console": StubSearchConsoleService(n_rows),
+        "search_console_credentials": None,
+        f"google_ads:{API_VERSION}": StubAdsClient(n_rows),
+    })
+
+
+# Report frames shaped like fetch_reports output, built directly for the summary benchmarks
+def build_report_frame(report_name, start_date, end_date, n_rows):
+    spec = REPORT_SPECS[report_name]
+    response = build_run_report_response(spec["dimensions"], spec["metrics"], start_date, end_date, n_rows)
+    return shape_frame(spec, decode_report(response))
+
+
+# Inputs in the shape summarize_acquisition_sources expects: traffic rows and lead events both keyed by page
+def build_acquisition_frames(start_date, end_date, n_rows):
+    source = build_report_frame("source", start_date, end_date, n_rows)
+    source["Page Path"] = np.where(np.arange(len(source)) % 10 == 0, "/contact", "/")
+    events = build_report_frame("event", start_date, end_date, max(n_rows // 10, 1))
+    events["Page Path"] = np.where(events["Event Name"] == "generate_lead", "/contact", "/")
+    return source, events.groupby("Page Path", as_index=False)["Event Count"].sum()
@@ -0,0 +1,83 @@
+# Benchmark the GA4 RunReport decoder against the old row-by-row parse
+#
+# Run from the repo root (uses the same Streamlit secrets as the app):
+#   python -m benchmarks.ga4_decoder --rows 100000
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from google.analytics.data_v1beta.types import RunReportResponse, MetricType
+
+from ga4_data_pull import decode_report, COLUMN_NAMES, TRAFFIC_METRICS
+
+INTEGER_METRICS = {"activeUsers", "sessions", "screenPageViews", "newUsers"}
+
+
+# Build a synthetic sessionSource x date response with the given number of rows
+def build_response(n_rows, seed=0):
+    rng = random.Random(seed)
+    response = RunReportResponse()
+    raw = RunReportResponse.pb(response)
+
+    raw.dimension_headers.add(name="sessionSource")
+    raw.dimension_headers.add(name="date")
+    for name in TRAFFIC_METRICS:
+        metric_type = MetricType.TYPE_INTEGER if name in INTEGER_METRICS else MetricType.TYPE_FLOAT
+        raw.metric_headers.add(name=name, type_=metric_type)
+
+    start = date(2024, 1, 1)
+    for i in range(n_rows):
+        row = raw.rows.add()
+        row.dimension_values.add(value=f"source-{i % 500}")
+        row.dimension_values.add(value=(start + timedelta(days=i % 365)).strftime("%Y%m%d"))
+        for name in TRAFFIC_METRICS:
+            if name in INTEGER_METRICS:
+                row.metric_values.add(value=str(rng.randint(0, 5000)))
+            else:
+                row.metric_values.add(value=repr(rng.random() * 100))
+
+    return response
+
+
+# The parse the fetchers used before decode_report, kept here as the baseline
+def legacy_parse(response):
+    rows = []
+    for row in response.rows:
+        session_source = row.dimension_values[0].value
+        row_date = row.dimension_values[1].value
+        metrics = [pd.to_numeric(row.metric_values[i].value, errors='coerce') for i in range(6)]
+        rows.append([row_date, session_source] + metrics)
+
+    df = pd.DataFrame(rows, columns=['Date', 'Session Source'] + [COLUMN_NAMES[m] for m in TRAFFIC_METRICS])
+    for col in df.columns[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def time_parse(parse, response, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(response)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'decoder rows/s':>15} {'speedup':>8}")
+    for n_rows in args.rows:
+        response = build_response(n_rows)
+        legacy = time_parse(legacy_parse, response, args.repeat)
+        decoder = time_parse(decode_report, response, args.repeat)
+        print(f"{n_rows:>10} {n_rows / legacy:>15,.0f} {n_rows / decoder:>15,.0f} {legacy / decoder:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
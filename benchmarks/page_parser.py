@@ -0,0 +1,88 @@
+# Benchmark the single-pass page copy parser against the full BeautifulSoup parse
+#
+# Run from the repo root over a folder of saved pages (e.g. "Save page as" HTML files),
+# or without --corpus to generate a synthetic corpus:
+#   python -m benchmarks.page_parser --corpus saved_pages/
+#   python -m benchmarks.page_parser --pages 200
+import argparse
+import glob
+import os
+import random
+import time
+
+from site_crawler import parse_page
+
+WORDS = "search ads local service coaching team mental performance plan contact book today free quote".split()
+
+
+# A synthetic page with the head, navigation, copy and scripts a typical small business site has
+def build_page(seed=0, sections=40):
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    body = ['<nav><ul>' + "".join(f'<li><a href="/page-{i}">{sentence(2)}</a></li>' for i in range(30)) + '</ul></nav>']
+    for i in range(sections):
+        body.append(
+            f'<section class="block-{i}"><div class="row"><div class="col">'
+            f'<h2>{sentence(4)}</h2><p>{sentence(25)} <strong>{sentence(3)}</strong> <a href="/contact#form">{sentence(2)}</a></p>'
+            f'<img src="/img/{i}.jpg" alt="{sentence(3)}"><p>{sentence(40)}</p></div></div></section>'
+        )
+        if i % 10 == 0:
+            body.append(f'<script>window.data_{i} = {{"items": [1, 2, 3], "label": "<p>not copy</p>"}};</script>')
+
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{sentence(5)}</title>'
+        f'<meta name="description" content="{sentence(20)}"><meta name="keywords" content="{", ".join(WORDS[:5])}">'
+        '<link rel="stylesheet" href="/style.css"><style>body { margin: 0 } p > a { color: red }</style>'
+        f'</head><body><header><h1>{sentence(6)}</h1></header>{"".join(body)}'
+        f'<footer><p>{sentence(10)}</p><!-- footer --></footer></body></html>'
+    )
+
+
+def load_corpus(folder):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*.htm*"), recursive=True)):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+
+def time_engine(engine, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in pages:
+            parse_page(html, engine=engine)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="folder of saved .html pages (default: synthetic pages)")
+    parser.add_argument("--pages", type=int, default=100, help="synthetic pages to generate")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else [build_page(seed) for seed in range(args.pages)]
+    if not pages:
+        parser.error(f"no .html files found in {args.corpus}")
+
+    # Both engines must agree before their speed means anything
+    mismatches = sum(parse_page(html, engine="fast") != parse_page(html, engine="soup") for html in pages)
+
+    megabytes = sum(len(html.encode("utf-8")) for html in pages) / 1e6
+    soup = time_engine("soup", pages, args.repeat)
+    fast = time_engine("fast", pages, args.repeat)
+
+    print(f"{len(pages)} pages, {megabytes:.1f} MB, {mismatches} with different output")
+    print(f"{'engine':>8} {'pages/s':>10} {'MB/s':>8}")
+    print(f"{'soup':>8} {len(pages) / soup:>10,.0f} {megabytes / soup:>8.1f}")
+    print(f"{'fast':>8} {len(pages) / fast:>10,.0f} {megabytes / fast:>8.1f}   {soup / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
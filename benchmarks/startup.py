@@ -0,0 +1,64 @@
+# Measure cold import time of the app's modules and which heavy libraries each one pulls in
+#
+# Every measurement runs in a fresh interpreter, so nothing is shared between runs.
+# Run from the repo root (uses the same Streamlit secrets as the app):
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --modules homepage seo_helper --repeat 10
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "homepage",
+    "seo_helper",
+    "gaw_camapignbuilder",
+    "ga4_data_pull",
+    "gsc_data_pull",
+    "llm_integration",
+    "gaw_data_pull",
+]
+
+# Libraries that should only load when a page actually calls an API or draws a chart
+HEAVY_LIBRARIES = ["grpc", "google.ads.googleads", "google.analytics.data_v1beta", "plotly.express", "openai", "googleapiclient.discovery"]
+
+# Imports streamlit first so the figure is the module's own cost on top of what every page pays
+PROBE = """
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    timings = []
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_LIBRARIES)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<22} {'import s':>9}  heavy libraries loaded")
+    for module in args.modules:
+        seconds, loaded = measure(module, args.repeat)
+        print(f"{module:<22} {seconds:>9.3f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+# Offline benchmark suite for the GA4, Search Console and Google Ads data paths and the LLM queue
+#
+# Every client is a stub serving synthetic payloads (benchmarks/fixtures.py), or for OpenAI a local
+# fake endpoint (benchmarks/fake_openai.py), so no credentials or network are needed. Run from the repo root:
+#   python -m benchmarks.suite                                # 1k, 10k and 100k rows
+#   python -m benchmarks.suite --rows 1000000 10000000 --only ga4.decode
+#   python -m benchmarks.suite --save-baseline                # re-record the baseline
+#
+# Each benchmark's time is the median of --repeat runs (at least 3, more for quick benchmarks).
+# Throughput is compared as a relative speed: rows per second times the median time of a fixed
+# reference workload timed at the start of the same run (see calibrate), so a baseline recorded on
+# one machine still holds on a faster or slower one.
+# Without --save-baseline, results are compared with the stored baseline and the run exits
+# with status 1 when relative speed drops or peak memory grows by more than --tolerance.
+# With --ci it also exits with status 1 when a result has no baseline to compare with.
+#
+# Re-record the baseline whenever a change is meant to move the numbers, or a benchmark is added or
+# renamed: run the full suite with --save-baseline (default row counts) on an otherwise idle machine
+# and commit benchmarks/baseline.json. Entries for benchmarks that no longer exist are dropped.
+import argparse
+import gc
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import call_queue
+import clients
+import ga4_data_pull
+import ga4_query_planner
+import ga4_scheduler
+import ga4_warehouse
+import gsc_data_pull
+import gaw_data_pull
+import llm_queue
+from benchmarks import fixtures
+from benchmarks.fake_openai import ANSWER, start_fake_openai
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Runs of the reference workload, timed before the benchmarks while the process is still fresh
+CALIBRATION_REPEAT = 7
+
+# Fewer repeats than this and the median is at the mercy of a single noisy run
+MIN_REPEAT = 3
+
+# Benchmarks quicker than this many seconds over their repeats are run again (up to MAX_RUNS times
+# in all), so the median of a millisecond-scale run isn't decided by a few scheduler hiccups
+MIN_MEASURE_SECONDS = 1.0
+MAX_RUNS = 50
+
+# A settled 28-day window ending a few days ago, so the summaries' "last 30 days" filters keep every row
+END_DATE = date.today() - timedelta(days=ga4_warehouse.SETTLING_DAYS + 1)
+START_DATE = END_DATE - timedelta(days=27)
+
+
+def ga4_decode(n_rows, workdir):
+    spec = ga4_data_pull.REPORT_SPECS["source"]
+    response = fixtures.build_run_report_response(spec["dimensions"], spec["metrics"], START_DATE.isoformat(), END_DATE.isoformat(), n_rows)
+    return lambda: ga4_data_pull.decode_report(response)
+
+
+# Cold fetch of the dashboard reports through the warehouse: every day is missing, so all rows are fetched and stored
+def ga4_fetch_reports(n_rows, workdir):
+    def run():
+        ga4_warehouse.WAREHOUSE_PATH = os.path.join(workdir, f"warehouse-{time.perf_counter_ns()}.sqlite")
+        return ga4_data_pull.fetch_reports(list(ga4_data_pull.REPORT_SPECS), START_DATE.isoformat(), END_DATE.isoformat())
+    return run
+
+
+# Warm fetch: the warehouse already holds the range, so reports are served locally
+def ga4_fetch_reports_warm(n_rows, workdir):
+    ga4_warehouse.WAREHOUSE_PATH = os.path.join(workdir, f"warehouse-warm-{n_rows}.sqlite")
+    ga4_data_pull.fetch_reports(list(ga4_data_pull.REPORT_SPECS), START_DATE.isoformat(), END_DATE.isoformat())
+    return lambda: ga4_data_pull.fetch_reports(list(ga4_data_pull.REPORT_SPECS), START_DATE.isoformat(), END_DATE.isoformat())
+
+
+# Landing page totals streamed page by page into running per-page aggregates
+def ga4_landing_page_totals(n_rows, workdir):
+    return lambda: ga4_data_pull.fetch_landing_page_totals(START_DATE.isoformat(), END_DATE.isoformat())
+
+
+# Cold sync of the dashboard's planned daily reports: every day is missing, so all planned rows are fetched and stored
+def ga4_planned_sync(n_rows, workdir):
+    def run():
+        ga4_warehouse.WAREHOUSE_PATH = os.path.join(workdir, f"warehouse-planned-{time.perf_counter_ns()}.sqlite")
+        return ga4_query_planner.sync_dashboard_reports(START_DATE.isoformat(), END_DATE.isoformat())
+    return run
+
+
+# Thirty dashboards requesting their planned leads report at once through the GA4 scheduler, a third of them
+# as background work, against a property that allows ten concurrent requests and fails a fifth of all calls
+# with 503s. Every load has to succeed without the scheduler going over its concurrency cap.
+def ga4_scheduled_burst(n_rows, workdir):
+    priorities = [call_queue.BACKGROUND if i % 3 == 0 else call_queue.INTERACTIVE for i in range(30)]
+    leads = ga4_query_planner.plan_spec(ga4_query_planner.plan_queries(["event"])[0])
+
+    def load(priority):
+        return list(ga4_data_pull.iter_report_pages(leads, START_DATE.isoformat(), END_DATE.isoformat(), priority=priority))
+
+    def run():
+        client = fixtures.StubGA4Client(n_rows, tokens_per_hour=10 ** 9, max_concurrent=10, error_rate=0.2)
+        clients.shared_clients["ga4"] = client
+        with ThreadPoolExecutor(max_workers=len(priorities)) as executor:
+            loads = [executor.submit(load, priority) for priority in priorities]
+            results = [load.result() for load in loads]
+
+        if client.peak_in_flight > ga4_scheduler.MAX_CONCURRENT_REQUESTS:
+            raise RuntimeError(f"{client.peak_in_flight} concurrent GA4 calls, over the scheduler's cap of {ga4_scheduler.MAX_CONCURRENT_REQUESTS}")
+        return results
+    return run
+
+
+# Completions through the LLM queue against the fake OpenAI endpoint, which takes 20 requests a second and
+# fails a fifth of them with 503s. The queue is limited a little under that but starts with two seconds'
+# worth of requests banked, so the first burst runs into 429s too. Half the calls stream. Every call has to
+# come back with the full answer, and the server has to have refused some, so the retries are exercised.
+def llm_dispatch(n_rows, workdir):
+    from openai import OpenAI
+    server, base_url = start_fake_openai(rpm=20, error_rate=0.2, latency=0.01, window=1.0)
+    clients.shared_clients["openai"] = OpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+    llm_queue.REQUESTS_PER_MINUTE = 18 * 60
+    calls = min(max(n_rows // 100, 40), 120)
+
+    def complete(i):
+        messages = [{"role": "user", "content": f"Question {i}"}]
+        if i % 2:
+            stream = llm_queue.dispatch_stream(lambda: clients.openai_client().chat.completions.create(
+                model="gpt-4o-mini", messages=messages, stream=True, stream_options={"include_usage": True}), 10)
+            return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+        response = llm_queue.dispatch(lambda: clients.openai_client().chat.completions.create(
+            model="gpt-4o-mini", messages=messages), 10)
+        return response.choices[0].message.content
+
+    def run():
+        llm_queue.bucket.update(requests=40.0, tokens=float(llm_queue.TOKENS_PER_MINUTE),
+                                updated_at=time.monotonic(), paused_until=0.0)
+        refused = server.stats["rate_limited"] + server.stats["failed"]
+        with ThreadPoolExecutor(max_workers=llm_queue.MAX_CONCURRENT_COMPLETIONS) as executor:
+            answers = list(executor.map(complete, range(calls)))
+
+        completed = sum(1 for answer in answers if answer == ANSWER)
+        if completed != calls:
+            raise RuntimeError(f"{completed} of {calls} completions came back with the full answer")
+        if server.stats["rate_limited"] + server.stats["failed"] == refused:
+            raise RuntimeError("the fake endpoint refused no calls, so no retries were exercised")
+        return answers
+    return run
+
+
+def summary_inputs(n_rows):
+    start, end = START_DATE.isoformat(), END_DATE.isoformat()
+    return {name: fixtures.build_report_frame(name, start, end, n_rows) for name in ga4_data_pull.REPORT_SPECS}
+
+
+def ga4_summarize_monthly(n_rows, workdir):
+    frames = summary_inputs(n_rows)
+    return lambda: ga4_data_pull.summarize_monthly_data(frames["source"], frames["event"])
+
+
+def ga4_summarize_landing_pages(n_rows, workdir):
+    frames = summary_inputs(n_rows)
+    return lambda: ga4_data_pull.summarize_landing_pages(frames["landing_page"], frames["event"])
+
+
+# The dashboard's planned reports synced into a fresh warehouse, as slices to build rollups from
+def synced_reports(n_rows, workdir):
+    ga4_warehouse.WAREHOUSE_PATH = os.path.join(workdir, f"warehouse-rollups-{n_rows}.sqlite")
+    return ga4_query_planner.sync_dashboard_reports(START_DATE.isoformat(), END_DATE.isoformat())
+
+
+# Daily rollups folded page by page out of the warehouse
+def ga4_build_rollups(n_rows, workdir):
+    slices = synced_reports(n_rows, workdir)
+    return lambda: (ga4_data_pull.build_source_rollup(slices["source"]),
+                    ga4_data_pull.build_landing_page_rollup(slices["landing_page"]),
+                    ga4_data_pull.build_event_rollup(slices["event"]))
+
+
+# Dashboard summaries for a 7-day window read off prebuilt rollups, the work done when the date picker moves
+def ga4_summarize_window(n_rows, workdir):
+    source, landing_page, event = ga4_build_rollups(n_rows, workdir)()
+    window = (END_DATE - timedelta(days=6), END_DATE)
+    return lambda: (ga4_data_pull.summarize_monthly_window(source, event, window),
+                    ga4_data_pull.summarize_landing_pages_window(landing_page, event, window))
+
+
+def ga4_summarize_acquisition(n_rows, workdir):
+    source, events = fixtures.build_acquisition_frames(START_DATE.isoformat(), END_DATE.isoformat(), n_rows)
+    return lambda: ga4_data_pull.summarize_acquisition_sources(source, events)
+
+
+# Page through every query row and build the top-queries summary from them
+def gsc_fetch_summarize(n_rows, workdir):
+    def run():
+        pages = gsc_data_pull.iter_search_console_pages(START_DATE.isoformat(), END_DATE.isoformat(), dimensions=["query"])
+        return gsc_data_pull.summarize_search_queries(pd.concat(list(pages), ignore_index=True))
+    return run
+
+
+def gsc_export(n_rows, workdir):
+    def run():
+        path = os.path.join(workdir, f"gsc-{time.perf_counter_ns()}.sqlite")
+        return gsc_data_pull.export_search_console_data(START_DATE.isoformat(), END_DATE.isoformat(), path=path)
+    return run
+
+
+# Ideas for ten seeds, n_rows ideas each, deduplicated into one frame; the cache is cleared so every seed is fetched
+def ads_keyword_ideas(n_rows, workdir):
+    fixtures.install_stub_clients(max(n_rows // 10, 1))
+    seeds = [f"https://example.com/service-{i}" for i in range(10)]
+
+    def run():
+        gaw_data_pull.idea_cache.clear()
+        return gaw_data_pull.fetch_keyword_ideas("0", urls=seeds)
+    return run
+
+
+def ads_keyword_metrics(n_rows, workdir):
+    keywords = [f"synthetic keyword {i}" for i in range(n_rows)]
+
+    def run():
+        gaw_data_pull.idea_cache.clear()
+        return gaw_data_pull.fetch_keyword_metrics("0", keywords)
+    return run
+
+
+# name -> function building the callable to time for a given row count
+BENCHMARKS = {
+    "ga4.decode": ga4_decode,
+    "ga4.fetch_reports": ga4_fetch_reports,
+    "ga4.fetch_reports_warm": ga4_fetch_reports_warm,
+    "ga4.landing_page_totals": ga4_landing_page_totals,
+    "ga4.planned_sync": ga4_planned_sync,
+    "ga4.scheduled_burst": ga4_scheduled_burst,
+    "ga4.summarize_monthly_data": ga4_summarize_monthly,
+    "ga4.summarize_landing_pages": ga4_summarize_landing_pages,
+    "ga4.summarize_acquisition_sources": ga4_summarize_acquisition,
+    "ga4.build_rollups": ga4_build_rollups,
+    "ga4.summarize_window": ga4_summarize_window,
+    "gsc.fetch_summarize": gsc_fetch_summarize,
+    "gsc.export": gsc_export,
+    "ads.keyword_ideas": ads_keyword_ideas,
+    "ads.keyword_metrics": ads_keyword_metrics,
+    "llm.dispatch": llm_dispatch,
+}
+
+
+# Median wall time over the repeats (more for quick benchmarks), then one extra traced run for peak Python memory
+def measure(run, repeat):
+    times = []
+    while len(times) < repeat or (sum(times) < MIN_MEASURE_SECONDS and len(times) < MAX_RUNS):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+# A fixed mix of the work the data paths do (pandas grouping, JSON encoding, SQLite inserts) whose
+# time tracks how fast this machine runs them
+def reference_workload():
+    frame = pd.DataFrame({"key": np.arange(200_000) % 997, "value": np.arange(200_000, dtype=np.float64)})
+    frame.groupby("key")["value"].agg(["sum", "mean"])
+
+    rows = [(i, f"/page-{i % 997}", i * 0.5) for i in range(50_000)]
+    json.dumps(rows)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (n INTEGER, path TEXT, value REAL)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+    conn.close()
+
+
+# Median time of the reference workload in seconds, after one untimed warm-up run
+def calibrate(repeat=CALIBRATION_REPEAT):
+    reference_workload()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        reference_workload()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+# Throughput scaled by the reference time: the rows a benchmark gets through in one reference workload's time
+def relative_speed(result, reference_seconds):
+    return result["rows_per_second"] * reference_seconds
+
+
+def run_suite(names, row_counts, repeat):
+    # Keyword requests are normally spaced out for the API quota; the stubs have none
+    gaw_data_pull.MIN_REQUEST_INTERVAL = 0
+
+    # Retries after injected errors back off briefly, so the timings measure the scheduling rather than the sleeps.
+    # With a fifth of calls failing, some call in a run of hundreds would use up the usual five retries by chance.
+    call_queue.BACKOFF_BASE = 0.05
+    call_queue.MAX_RETRIES = 10
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="bizbuddy-bench-")
+    try:
+        for n_rows in row_counts:
+            for name in names:
+                fixtures.install_stub_clients(n_rows)
+                run = BENCHMARKS[name](n_rows, workdir)
+                seconds, peak = measure(run, repeat)
+                results.append({
+                    "name": name,
+                    "rows": n_rows,
+                    "seconds": seconds,
+                    "rows_per_second": n_rows / seconds if seconds else float("inf"),
+                    "peak_mb": peak / 1e6,
+                })
+                print(f"{name:<36} {n_rows:>10,} {seconds:>9.3f} {results[-1]['rows_per_second']:>14,.0f} {peak / 1e6:>9.1f}", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, reference_seconds):
+    baseline = load_baseline(path)
+    baseline = {key: entry for key, entry in baseline.items() if key.split("@")[0] in BENCHMARKS}
+    for result in results:
+        # rows_per_second is kept for reading; only relative_speed is compared
+        baseline[f"{result['name']}@{result['rows']}"] = {
+            "rows_per_second": result["rows_per_second"],
+            "relative_speed": relative_speed(result, reference_seconds),
+            "peak_mb": result["peak_mb"],
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+# Results whose relative speed fell or whose peak memory grew by more than the tolerance
+def find_regressions(results, baseline, tolerance, reference_seconds):
+    regressions = []
+    for result in results:
+        expected = baseline.get(f"{result['name']}@{result['rows']}")
+        if expected is None:
+            continue
+        speed = relative_speed(result, reference_seconds)
+        if speed < expected["relative_speed"] * (1 - tolerance):
+            regressions.append(f"{result['name']} @ {result['rows']:,} rows: "
+                               f"{speed:,.0f} rows per reference run vs {expected['relative_speed']:,.0f} baseline "
+                               f"({result['rows_per_second']:,.0f} rows/s here)")
+        if result["peak_mb"] > expected["peak_mb"] * (1 + tolerance) + 1:
+            regressions.append(f"{result['name']} @ {result['rows']:,} rows: "
+                               f"{result['peak_mb']:.1f} MB peak vs {expected['peak_mb']:.1f} MB baseline")
+    return regressions
+
+
+def main():
+    # pandas copy warnings from the summaries would bury the results table
+    warnings.simplefilter("ignore", category=FutureWarning)
+    warnings.simplefilter("ignore", category=pd.errors.SettingWithCopyWarning)
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the BizBuddy data paths.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="rows per synthetic report")
+    parser.add_argument("--only", nargs="+", help="benchmark names or name prefixes to run (e.g. ga4 gsc.export)")
+    parser.add_argument("--repeat", type=int, default=MIN_REPEAT, help=f"runs per benchmark, the median is kept (at least {MIN_REPEAT})")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / memory growth (default 0.25)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--ci", action="store_true", help="fail when the baseline is missing or lacks any result")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    if not names:
+        parser.error(f"no benchmarks match {args.only}; available: {', '.join(BENCHMARKS)}")
+    if args.repeat < MIN_REPEAT:
+        parser.error(f"--repeat must be at least {MIN_REPEAT}")
+
+    # Timed first: after the larger benchmarks the process heap no longer matches a fresh one
+    reference_seconds = calibrate()
+    print(f"Reference workload: {reference_seconds:.3f} s\n")
+    print(f"{'benchmark':<36} {'rows':>10} {'seconds':>9} {'rows/s':>14} {'peak MB':>9}")
+    results = run_suite(names, args.rows, args.repeat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{**result, "relative_speed": relative_speed(result, reference_seconds)} for result in results], f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, reference_seconds)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    missing = [f"{result['name']}@{result['rows']}" for result in results if f"{result['name']}@{result['rows']}" not in baseline]
+    if missing:
+        print(f"\nNo baseline at {args.baseline} for {', '.join(missing)}; run with --save-baseline to record one")
+        if args.ci:
+            raise SystemExit(1)
+
+    regressions = find_regressions(results, baseline, args.tolerance, reference_seconds)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    if len(missing) < len(results):
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import heapq
+import random
+import itertools
+import threading
+
+# Priority-ordered waiting and retry backoff shared by the API schedulers (ga4_scheduler, llm_queue).
+# Lower priorities go first: dashboard views before background jobs such as the nightly precompute.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Retries after a rate limit or transient server error, with full-jitter backoff between base and cap seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+# A line of waiting calls: {"condition", "waiting" (heap of (priority, sequence, lane) tickets), "sequence"}.
+# Callers hold the condition while they wait their turn and while they change what delay() reads.
+def new_queue():
+    return {"condition": threading.Condition(), "waiting": [], "sequence": itertools.count()}
+
+
+# Block until this call is first in its lane (by priority, then arrival) and delay() returns 0. delay()
+# gives the seconds the call must still wait; the caller must hold queue["condition"] and notify it
+# whenever that may have changed. Returns with the condition still held, so the caller can take its slot.
+def wait_turn(queue, priority, delay, lane=None):
+    ticket = (priority, next(queue["sequence"]), lane)
+    heapq.heappush(queue["waiting"], ticket)
+    try:
+        while True:
+            first = min(waiting for waiting in queue["waiting"] if waiting[2] == lane)
+            remaining = delay()
+            if first == ticket and remaining == 0:
+                return
+            # Woken early whenever a call finishes or the limits change
+            queue["condition"].wait(timeout=remaining if first == ticket else 1.0)
+    finally:
+        queue["waiting"].remove(ticket)
+        heapq.heapify(queue["waiting"])
+
+
+# Calls waiting in a lane
+def queued(queue, lane=None):
+    return sum(1 for ticket in queue["waiting"] if ticket[2] == lane)
+
+
+# Seconds to wait before retry number attempt (from 0), with full jitter
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
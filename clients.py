@@ -0,0 +1,70 @@
+import threading
+import streamlit as st
+
+# API clients shared by the whole process. Each is built the first time it is asked for, and
+# its client library is only imported then, so pages that never call an API don't pay for it.
+shared_clients = {}
+shared_clients_lock = threading.RLock()
+
+
+def shared_client(name, build):
+    with shared_clients_lock:
+        if name not in shared_clients:
+            shared_clients[name] = build()
+        return shared_clients[name]
+
+
+# The app's own GA4 property
+def ga4_property_id():
+    return shared_client("ga4_property_id", lambda: str(st.secrets["google_service_account"]["property_id"]))
+
+
+def ga4_client():
+    def build():
+        from google.analytics.data_v1beta import BetaAnalyticsDataClient
+        return BetaAnalyticsDataClient.from_service_account_info(st.secrets["google_service_account"])
+    return shared_client("ga4", build)
+
+
+# Read-only Search Console credentials for the app's own site
+def search_console_credentials():
+    def build():
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_info(
+            st.secrets["google_service_account"],
+            scopes=['https://www.googleapis.com/auth/webmasters.readonly']
+        )
+    return shared_client("search_console_credentials", build)
+
+
+def search_console_service():
+    def build():
+        from googleapiclient.discovery import build
+        return build('searchconsole', 'v1', credentials=search_console_credentials())
+    return shared_client("search_console", build)
+
+
+# base_url in the openai secrets points the client at another endpoint (a proxy or a local fake).
+# Retries are left to llm_queue, which spaces them out across every caller.
+def openai_client():
+    def build():
+        from openai import OpenAI
+        settings = st.secrets["openai"]
+        return OpenAI(api_key=settings["api_key"], base_url=settings.get("base_url"), max_retries=0)
+    return shared_client("openai", build)
+
+
+# One client per API version, since GoogleAdsClient is bound to the version it was loaded with
+def ads_client(version):
+    def build():
+        from google.ads.googleads.client import GoogleAdsClient
+        credentials_dict = {
+            "developer_token": st.secrets["google_ads"]["developer_token"],
+            "client_id": st.secrets["google_ads"]["client_id"],
+            "client_secret": st.secrets["google_ads"]["client_secret"],
+            "refresh_token": st.secrets["google_ads"]["refresh_token"],
+            "login_customer_id": None,  # Optional for test accounts
+            "use_proto_plus": True
+        }
+        return GoogleAdsClient.load_from_dict(credentials_dict, version=version)
+    return shared_client(f"google_ads:{version}", build)
@@ -0,0 +1,158 @@
+import os
+import json
+from datetime import datetime, timedelta
+import pandas as pd
+from report_graph import evaluate_stages
+import ga4_warehouse
+import call_queue
+from ga4_data_pull import previous_window
+from ga4_query_planner import sync_dashboard_reports
+
+# Every summary, chart and piece of copy the homepage dashboard shows
+DASHBOARD_STAGES = [
+    "current_summary",
+    "acquisition_summary",
+    "acquisition_pie_chart",
+    "top_sources",
+    "landing_page_summary",
+    "page_summary_copy",
+]
+
+# LLM insights based on GA data
+GA_INSIGHTS_PROMPT = """
+           Based on the following website performance metrics, provide a short analysis. Highlight key improvements, areas needing attention,
+           and how these metrics compare to typical industry standards. Limit your response to 2-3 bullet points.
+           """
+
+# LLM insights based on the page overview
+PAGE_INSIGHTS_PROMPT = "Provide insights based on the following page performance data, note that there is no CTAs on any page besides the Home. We need to think of ways to drive more people to the contact page. State only the bullets, no pre text. Limit your response to 2-3 bullet points:"
+
+# Summary frames written to disk as CSV by the precompute job
+FRAME_ARTIFACTS = ["current_summary", "acquisition_summary", "top_sources", "landing_page_summary"]
+
+# Where precomputed reports live, and how old they may be before the dashboard goes live again
+REPORTS_DIR = os.environ.get("BIZBUDDY_REPORTS_DIR", "reports")
+MAX_ARTIFACT_AGE = timedelta(hours=26)
+
+
+# Run the dashboard stages over the synced dashboard reports (summary name -> WarehouseSlice, see
+# ga4_query_planner.sync_dashboard_reports). Every summary, chart and piece of copy is a fingerprinted
+# stage, so with a memo that outlives the call only what changed is recomputed.
+# With a (start, end) date_window the summaries are read off daily rollups of the slices, which are built
+# once per sync and reused, so moving the window only redoes the window lookups and what depends on them.
+# Without one they summarize the slices' rows as loaded. With compare, the headline metrics also carry the
+# previous period's values and the change, which needs the slices to reach back over that period too.
+def build_report(report_rows, date_window=None, compare=False, memo=None):
+    sources = {f"{name}_rows": rows for name, rows in report_rows.items()}
+    if date_window is None:
+        return evaluate_stages(DASHBOARD_STAGES, sources, memo=memo)
+
+    window_stages = ["window_monthly_summary", "window_landing_page_summary"] + (["monthly_comparison"] if compare else [])
+    windowed = evaluate_stages(window_stages, {**sources, "date_window": tuple(date_window)}, memo=memo)
+
+    current_summary, acquisition_summary = windowed["window_monthly_summary"]
+    if compare:
+        current_summary = windowed["monthly_comparison"]
+    return evaluate_stages(
+        DASHBOARD_STAGES,
+        {"current_summary": current_summary, "acquisition_summary": acquisition_summary,
+         "landing_page_summary": windowed["window_landing_page_summary"]},
+        memo=memo,
+    )
+
+
+# Sync the dashboard's planned daily reports over the window (and the period before it, with compare)
+# and build the full report for the app's own site or a tenant. Days the warehouse already holds are
+# not fetched again, except recent ones that may have changed (all of them with refresh).
+def fetch_and_build_report(start_date, end_date, tenant=None, compare=True, memo=None, priority=call_queue.INTERACTIVE, progress=None, refresh=False):
+    date_window = (ga4_warehouse.resolve_date(start_date), ga4_warehouse.resolve_date(end_date))
+    fetch_start = previous_window(date_window)[0] if compare else date_window[0]
+    report_rows = sync_dashboard_reports(fetch_start.isoformat(), date_window[1].isoformat(),
+                                         tenant=tenant, priority=priority, progress=progress, refresh=refresh)
+    return build_report(report_rows, date_window, compare=compare, memo=memo)
+
+
+# Combine current summary into a string for LLM processing, with the previous period when it was compared
+def metric_summary_text(current_summary):
+    if "Previous Value" not in current_summary.columns:
+        return "\n".join([f"{row['Metric']}: {row['Value']}" for _, row in current_summary.iterrows()])
+
+    lines = []
+    for _, row in current_summary.iterrows():
+        change = "n/a" if pd.isna(row["Change (%)"]) else f"{row['Change (%)']:+.1f}%"
+        lines.append(f"{row['Metric']}: {row['Value']} (previous period: {row['Previous Value']}, change: {change})")
+    return "\n".join(lines)
+
+
+# The insight questions asked about a report: name -> (prompt, data summary)
+def insight_questions(report):
+    return {
+        "ga_insights": (GA_INSIGHTS_PROMPT, metric_summary_text(report["current_summary"])),
+        "page_insights": (PAGE_INSIGHTS_PROMPT, report["page_summary_copy"][1]),
+    }
+
+
+# Folder holding one site's precomputed report
+def report_dir(name="default", root=None):
+    return os.path.join(root or REPORTS_DIR, name)
+
+
+# Write summary frames, chart data and insight text for one site
+def write_artifacts(out_dir, report, insights, start_date, end_date):
+    import plotly.io as pio
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    for name in FRAME_ARTIFACTS:
+        report[name].to_csv(os.path.join(out_dir, f"{name}.csv"), index=False)
+
+    with open(os.path.join(out_dir, "acquisition_pie_chart.json"), "w", encoding="utf-8") as f:
+        f.write(pio.to_json(report["acquisition_pie_chart"]))
+
+    with open(os.path.join(out_dir, "insights.json"), "w", encoding="utf-8") as f:
+        json.dump(insights, f, indent=2)
+
+    # The manifest goes last so a half-written report is never picked up. Relative dates such as
+    # "30daysAgo" are stored as the days they meant when the report was generated.
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "start_date": ga4_warehouse.resolve_date(start_date).isoformat(),
+            "end_date": ga4_warehouse.resolve_date(end_date).isoformat(),
+        }, f, indent=2)
+
+
+# Load a precomputed report, or None when it is missing, too old or, given a (start, end) date_window,
+# covers a different window
+def load_artifacts(out_dir, date_window=None, max_age=MAX_ARTIFACT_AGE):
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    generated_at = datetime.fromisoformat(manifest["generated_at"])
+    if datetime.now() - generated_at > max_age:
+        return None
+
+    # e.g. last night's "30daysAgo" report no longer ends yesterday once the date has turned
+    if date_window is not None:
+        covered = tuple(ga4_warehouse.resolve_date(manifest[key], today=generated_at.date()) for key in ("start_date", "end_date"))
+        if covered != tuple(date_window):
+            return None
+
+    import plotly.io as pio
+
+    frames = {name: pd.read_csv(os.path.join(out_dir, f"{name}.csv")) for name in FRAME_ARTIFACTS}
+
+    # Page copy is cheap to rebuild from the saved landing page summary
+    report = evaluate_stages(["page_summary_copy"], frames)
+    report.update(frames)
+
+    with open(os.path.join(out_dir, "acquisition_pie_chart.json"), encoding="utf-8") as f:
+        report["acquisition_pie_chart"] = pio.from_json(f.read())
+
+    with open(os.path.join(out_dir, "insights.json"), encoding="utf-8") as f:
+        insights = json.load(f)
+
+    return report, insights, manifest
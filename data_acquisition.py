@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from ga4_query_planner import sync_dashboard_reports
+from gsc_data_pull import fetch_search_console_data
+from gaw_data_pull import fetch_keyword_data
+
+# Outcome of one source fetch: the data on success, the exception on failure or timeout
+AcquisitionResult = namedtuple("AcquisitionResult", ["name", "data", "error", "seconds"])
+
+# How long each source may take before the dashboard gives up on it (seconds)
+SOURCE_TIMEOUTS = {
+    "ga4": 120,
+    "search_console": 30,
+    "keywords": 45,
+}
+DEFAULT_TIMEOUT = 60
+
+# Upper bound on fetches running at the same time
+MAX_WORKERS = 4
+
+
+# Run independent fetches in parallel and gather one AcquisitionResult per source
+def acquire_all(fetches, timeouts=None, max_workers=MAX_WORKERS):
+    # fetches maps a source name to (function, args, kwargs)
+    timeouts = {**SOURCE_TIMEOUTS, **(timeouts or {})}
+
+    # Let worker threads write to the page (st.error, progress bars) of the current run
+    ctx = get_script_run_ctx()
+
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    def timed(func, args, kwargs):
+        started = time.perf_counter()
+        data = func(*args, **kwargs)
+        return data, time.perf_counter() - started
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="acquire", initializer=attach_ctx)
+    started = time.perf_counter()
+    futures = {
+        name: executor.submit(timed, func, args, kwargs)
+        for name, (func, args, kwargs) in fetches.items()
+    }
+
+    results = {}
+    for name, future in futures.items():
+        # Every deadline counts from the same start, so the total wait is the slowest source
+        timeout = timeouts.get(name, DEFAULT_TIMEOUT)
+        remaining = max(started + timeout - time.perf_counter(), 0)
+        try:
+            data, seconds = future.result(timeout=remaining)
+            results[name] = AcquisitionResult(name, data, None, seconds)
+        except FuturesTimeoutError:
+            error = TimeoutError(f"{name} did not respond within {timeout} seconds")
+            results[name] = AcquisitionResult(name, None, error, time.perf_counter() - started)
+        except Exception as e:
+            results[name] = AcquisitionResult(name, None, e, time.perf_counter() - started)
+
+    # Don't block on sources that timed out, their threads finish in the background
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+# Sync the GA4 dashboard reports, and fetch Search Console queries and keyword ideas, for a dashboard in
+# parallel. start_date and end_date ('YYYY-MM-DD') are the reported window; the GA4 reports are synced over
+# sync_dates (start, end) when given, so they can reach back over the comparison period too.
+def acquire_dashboard_data(start_date, end_date, tenant=None, ga4=True, sync_dates=None, refresh=False, progress=None,
+                           search_console=False, keyword_request=None, timeouts=None):
+    fetches = {}
+    if ga4:
+        fetches["ga4"] = (sync_dashboard_reports, sync_dates or (start_date, end_date),
+                          {"tenant": tenant, "progress": progress, "refresh": refresh})
+
+    # fetch_search_console_data takes the end of the range as a date
+    if search_console:
+        fetches["search_console"] = (fetch_search_console_data,
+                                     (start_date, datetime.strptime(end_date, "%Y-%m-%d")), {"tenant": tenant})
+
+    # keyword_request holds the fetch_keyword_data arguments (customer_id, location_ids, language_id, page_url)
+    if keyword_request:
+        fetches["keywords"] = (fetch_keyword_data, (), keyword_request)
+
+    return acquire_all(fetches, timeouts=timeouts)
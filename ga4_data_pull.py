@@ -1,173 +1,399 @@
+import itertools
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
 import calendar
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import RunReportRequest, DateRange, Dimension, Metric
 import streamlit as st
-import plotly.express as px
+import clients
+import ga4_warehouse
+import call_queue
+import ga4_scheduler
+import tenants
+from report_graph import stage
+from rollup_cube import build_rollup_from_pages, window_totals, ROWS_COLUMN
+from instrumentation import span, timed
+
+# The GA4 client library (which loads grpc) and plotly are imported where they are used,
+# so importing this module stays cheap until a report is actually fetched or plotted
+
+# Friendly column names for the GA4 API fields used across the dashboard
+COLUMN_NAMES = {
+    "date": "Date",
+    "sessionSource": "Session Source",
+    "pagePath": "Page Path",
+    "eventName": "Event Name",
+    "activeUsers": "Total Visitors",
+    "sessions": "Sessions",
+    "screenPageViews": "Pageviews",
+    "bounceRate": "Bounce Rate",
+    "averageSessionDuration": "Average Session Duration",
+    "newUsers": "New Users",
+    "eventCount": "Event Count",
+}
+
+# Traffic metrics shared by the source and landing page reports
+TRAFFIC_METRICS = [
+    "activeUsers",
+    "sessions",
+    "screenPageViews",
+    "bounceRate",
+    "averageSessionDuration",
+    "newUsers",
+]
+
+
+# Decode any RunReportResponse into a DataFrame, one typed column per header.
+# row_field picks which rows to decode: "rows", or "totals" for the TOTAL rows of an aggregated report.
+@timed("ga4.decode_report")
+def decode_report(response, column_names=COLUMN_NAMES, row_field="rows"):
+    from google.analytics.data_v1beta.types import MetricType
+
+    # Work on the raw protobuf message, iterating proto-plus wrappers is much slower
+    raw = type(response).pb(response)
+    rows = getattr(raw, row_field)
+
+    columns = {}
+
+    # Dimensions stay as strings
+    for i, header in enumerate(raw.dimension_headers):
+        columns[header.name] = [row.dimension_values[i].value for row in rows]
+
+    # Metrics are converted a whole column at a time, typed by the metric header
+    for i, header in enumerate(raw.metric_headers):
+        values = [row.metric_values[i].value for row in rows]
+        if header.type_ == MetricType.TYPE_INTEGER:
+            try:
+                columns[header.name] = np.array(values, dtype=np.int64)
+                continue
+            except ValueError:
+                pass
+        try:
+            columns[header.name] = np.array(values, dtype=np.float64)
+        except ValueError:
+            # Fall back to coercion when GA4 returns non-numeric values
+            columns[header.name] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+
+    df = pd.DataFrame(columns)
+    return df.rename(columns=column_names)
+
+
+# Declarative specs for each report: what to request and how to shape the frame.
+# A spec may also carry a "filter", an exact (dimension, value) match applied by GA4.
+REPORT_SPECS = {
+    "source": {
+        "dimensions": ["sessionSource", "date"],
+        "metrics": TRAFFIC_METRICS,
+        "columns": ['Date', 'Session Source', 'Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users'],
+        "sort_by": "Session Source",
+        "ascending": True,
+    },
+    "landing_page": {
+        "dimensions": ["pagePath", "date"],
+        "metrics": TRAFFIC_METRICS,
+        "columns": ['Date', 'Page Path', 'Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users'],
+        "sort_by": "Page Path",
+        "ascending": True,
+    },
+    "event": {
+        "dimensions": ["eventName", "date"],
+        "metrics": ["eventCount"],
+        "columns": ['Date', 'Event Name', 'Event Count'],
+        "sort_by": "Event Count",
+        "ascending": False,
+    },
+}
+
+# Compact dtypes for report frames: dimensions repeat a handful of values per day, so they are stored
+# as categories, and daily GA4 counts usually fit in int32 (pandas accumulates sums in int64).
+# Counts aggregated over long ranges can outgrow it, so int32 is only used when the values fit.
+# Rates and durations stay float64, since the summaries sum and average them.
+DIMENSION_COLUMNS = ["Session Source", "Page Path", "Event Name"]
+INTEGER_COLUMNS = ["Total Visitors", "Sessions", "Pageviews", "New Users", "Event Count"]
+FLOAT_COLUMNS = ["Bounce Rate", "Average Session Duration"]
+INT32_RANGE = np.iinfo(np.int32)
+
+# GA4 accepts at most 5 requests per BatchRunReports call
+MAX_BATCH_SIZE = 5
+
+# Rows per page when paging through a report (GA4 allows up to 250,000)
+PAGE_SIZE = 100000
+
+
+# GA4 property and client for a tenant, or the app's own property when no tenant is given
+def ga4_target(tenant=None):
+    if tenant is None:
+        return clients.ga4_property_id(), clients.ga4_client()
+    return tenant.property_id, tenants.ga4_client(tenant)
+
+
+# Build a RunReportRequest for a set of dimensions and metrics, optionally keeping only the rows
+# whose dimension_filter (dimension, value) matches exactly
+def build_report_request(dimensions, metrics, start_date, end_date, limit=0, offset=0, tenant=None, dimension_filter=None):
+    from google.analytics.data_v1beta.types import RunReportRequest, DateRange, Dimension, Metric, FilterExpression, Filter
 
-# Load the secrets for the service account path and property ID
-service_account_info = st.secrets["google_service_account"]
-property_id = st.secrets["google_service_account"]["property_id"]
-
-# Initialize GA Client using the service account JSON
-client = BetaAnalyticsDataClient.from_service_account_info(service_account_info)
-
-# Get traffic by source
-def fetch_metrics_by_source(start_date, end_date):
-    # Define the request to pull data aggregated by source
     request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="sessionSource"), Dimension(name="date")],  # Added 'date' dimension
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="sessions"),
-            Metric(name="screenPageViews"),
-            Metric(name="bounceRate"),
-            Metric(name="averageSessionDuration"),
-            Metric(name="newUsers"),
-        ],
+        property=f"properties/{ga4_target(tenant)[0]}",
+        dimensions=[Dimension(name=name) for name in dimensions],
+        metrics=[Metric(name=name) for name in metrics],
         date_ranges=[DateRange(start_date=start_date, end_date=end_date)],  # Define date range
+        limit=limit,
+        offset=offset,
+        return_property_quota=True,  # Lets the scheduler pace calls against the property's quota
     )
+    if dimension_filter:
+        field_name, value = dimension_filter
+        request.dimension_filter = FilterExpression(filter=Filter(
+            field_name=field_name,
+            string_filter=Filter.StringFilter(value=value, match_type=Filter.StringFilter.MatchType.EXACT),
+        ))
+    return request
+
+
+# Build the RunReportRequest for one page of a report spec
+def build_spec_request(spec, start_date, end_date, limit=0, offset=0, tenant=None):
+    return build_report_request(spec["dimensions"], spec["metrics"], start_date, end_date, limit=limit, offset=offset,
+                                tenant=tenant, dimension_filter=spec.get("filter"))
+
+
+# Convert a report frame to the compact schema: datetime64 dates, categorical dimensions, int32 counts where they fit
+def apply_schema(df):
+    # Reports aggregated over their whole date range have no Date column
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], format="%Y%m%d", errors='coerce')
+
+    for col in df.columns.intersection(DIMENSION_COLUMNS):
+        df[col] = df[col].astype("category")
+
+    for col in df.columns.intersection(INTEGER_COLUMNS):
+        values = pd.to_numeric(df[col], errors='coerce')
+        # Columns GA4 returned non-numeric values for keep their gaps as float
+        if not values.notna().all():
+            df[col] = values.astype(np.float64)
+        elif values.empty or (values.min() >= INT32_RANGE.min and values.max() <= INT32_RANGE.max):
+            df[col] = values.astype(np.int32)
+        else:
+            df[col] = values.astype(np.int64)
+
+    for col in df.columns.intersection(FLOAT_COLUMNS):
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+
+    return df
+
+
+# Sort and type a report frame according to its spec
+def shape_frame(spec, df):
+    df = df.reindex(columns=spec["columns"])
 
-    response = client.run_report(request)
-    
-    # Parse the response and create the dataframe for source-level metrics
-    rows = []
-    for row in response.rows:
-        session_source = row.dimension_values[0].value
-        date = row.dimension_values[1].value  # Capture the date
-        
-        # Convert all metrics to numeric values (with coercion to handle non-numeric data)
-        active_users = pd.to_numeric(row.metric_values[0].value, errors='coerce')
-        sessions = pd.to_numeric(row.metric_values[1].value, errors='coerce')
-        pageviews = pd.to_numeric(row.metric_values[2].value, errors='coerce')
-        bounce_rate = pd.to_numeric(row.metric_values[3].value, errors='coerce')
-        avg_session_duration = pd.to_numeric(row.metric_values[4].value, errors='coerce')
-        new_users = pd.to_numeric(row.metric_values[5].value, errors='coerce')
-        
-        rows.append([
-            date, session_source, active_users, sessions, pageviews, bounce_rate, avg_session_duration, new_users
-        ])
-    
-    # Create DataFrame for metrics by source
-    df_source_metrics = pd.DataFrame(rows, columns=[
-        'Date', 'Session Source', 'Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users'
-    ])
-    
-    # Convert all numeric columns to proper numeric types
-    numeric_cols = ['Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users']
-    for col in numeric_cols:
-        df_source_metrics[col] = pd.to_numeric(df_source_metrics[col], errors='coerce')
-    
     # Process data for easier handling
-    df_source_metrics.sort_values(by='Session Source', inplace=True)
+    df.sort_values(by=spec["sort_by"], ascending=spec["ascending"], inplace=True)
+
+    return apply_schema(df)
+
+
+# Run (report spec, start date, end date) jobs against GA4 in as few round trips as possible.
+# Yields each job with an iterator over its decoded pages, so no report is ever held in memory whole;
+# a job's pages have to be consumed before moving on to the next job.
+# progress(rows_fetched, row_count) is called as pages arrive, counted over every report requested so far.
+def run_report_batches(jobs, tenant=None, priority=call_queue.INTERACTIVE, progress=None):
+    from google.analytics.data_v1beta.types import BatchRunReportsRequest
+
+    target_property, target_client = ga4_target(tenant)
+    counts = {"fetched": 0, "expected": 0}
+
+    # The first page comes with the batch response, the rest are paged through one request at a time
+    def report_pages(job, response):
+        spec, start_date, end_date = job
+        pages = [decode_report(response).reindex(columns=spec["columns"])]
+        if response.row_count > len(response.rows):
+            pages = itertools.chain(pages, iter_report_pages(spec, start_date, end_date, offset=len(response.rows), tenant=tenant, priority=priority))
+
+        for page in pages:
+            counts["fetched"] += len(page)
+            if progress:
+                progress(counts["fetched"], counts["expected"])
+            yield page
+
+    # Plan the batches, GA4 caps the number of requests per call
+    for i in range(0, len(jobs), MAX_BATCH_SIZE):
+        batch_jobs = jobs[i:i + MAX_BATCH_SIZE]
+        batch_request = BatchRunReportsRequest(
+            property=f"properties/{target_property}",
+            requests=[
+                build_spec_request(spec, start_date, end_date, limit=PAGE_SIZE, tenant=tenant)
+                for spec, start_date, end_date in batch_jobs
+            ],
+        )
 
-    df_source_metrics['Date'] = pd.to_datetime(df_source_metrics['Date']).dt.date
-    
-    return df_source_metrics
+        with span("ga4.batch_run_reports") as details:
+            batch_response = ga4_scheduler.run_scheduled(target_client.batch_run_reports, batch_request, target_property, priority)
+            details["rows"] = sum(len(report.rows) for report in batch_response.reports)
+        counts["expected"] += sum(report.row_count for report in batch_response.reports)
 
-# Get data by landing page
-def fetch_metrics_by_landing_page(start_date, end_date):
-    # Define the request to pull data aggregated by landing page
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="pagePath"), Dimension(name="date")],  # Added 'date' dimension
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="sessions"),
-            Metric(name="screenPageViews"),
-            Metric(name="bounceRate"),
-            Metric(name="averageSessionDuration"),
-            Metric(name="newUsers"),
-        ],
-        date_ranges=[DateRange(start_date=start_date, end_date=end_date)],  # Define date range
+        # Reports come back in the same order they were requested
+        for job, response in zip(batch_jobs, batch_response.reports):
+            yield job, report_pages(job, response)
+
+
+# Yield a report spec's rows one page at a time so memory is bounded by the page size.
+# progress(rows_fetched, row_count) is called after every page.
+def iter_report_pages(spec, start_date, end_date, page_size=PAGE_SIZE, offset=0, progress=None, tenant=None, priority=call_queue.INTERACTIVE):
+    target_property, target_client = ga4_target(tenant)
+
+    while True:
+        request = build_spec_request(spec, start_date, end_date, limit=page_size, offset=offset, tenant=tenant)
+        with span("ga4.run_report") as details:
+            response = ga4_scheduler.run_scheduled(target_client.run_report, request, target_property, priority)
+            details["rows"] = len(response.rows)
+
+        if not response.rows:
+            break
+
+        offset += len(response.rows)
+        yield decode_report(response).reindex(columns=spec["columns"])
+
+        # Let the caller know how far along we are
+        if progress:
+            progress(offset, response.row_count)
+
+        if offset >= response.row_count:
+            break
+
+
+# Aggregate pages of rows as they arrive, keeping only running per-group totals in memory
+def aggregate_report_pages(pages, group_by, sum_cols, mean_cols):
+    totals = None
+    for page in pages:
+        grouped = page.groupby(group_by)
+
+        # Means are carried as a running sum and count so they stay exact across pages
+        partial = grouped[sum_cols + mean_cols].sum()
+        partial = partial.join(grouped[mean_cols].count().add_suffix(" (count)"))
+
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame(columns=[group_by] + sum_cols + mean_cols)
+
+    for col in mean_cols:
+        totals[col] = totals[col] / totals[f"{col} (count)"]
+
+    return totals[sum_cols + mean_cols].reset_index()
+
+
+# Per-page totals for high-cardinality sites, streamed page by page instead of held in memory
+@timed("ga4.fetch_landing_page_totals")
+def fetch_landing_page_totals(start_date, end_date, page_size=PAGE_SIZE, progress=None, tenant=None, priority=call_queue.INTERACTIVE):
+    pages = iter_report_pages(REPORT_SPECS["landing_page"], start_date, end_date, page_size=page_size, progress=progress, tenant=tenant, priority=priority)
+    return aggregate_report_pages(
+        pages,
+        group_by="Page Path",
+        sum_cols=["Total Visitors", "Sessions", "Pageviews", "New Users"],
+        mean_cols=["Bounce Rate", "Average Session Duration"],
     )
 
-    response = client.run_report(request)
-    
-    # Parse the response and create the dataframe for landing page-level metrics
-    rows = []
-    for row in response.rows:
-        page_path = row.dimension_values[0].value
-        date = row.dimension_values[1].value  # Capture the date
-        
-        # Convert all metrics to numeric values (with coercion to handle non-numeric data)
-        active_users = pd.to_numeric(row.metric_values[0].value, errors='coerce')
-        sessions = pd.to_numeric(row.metric_values[1].value, errors='coerce')
-        pageviews = pd.to_numeric(row.metric_values[2].value, errors='coerce')
-        bounce_rate = pd.to_numeric(row.metric_values[3].value, errors='coerce')
-        avg_session_duration = pd.to_numeric(row.metric_values[4].value, errors='coerce')
-        new_users = pd.to_numeric(row.metric_values[5].value, errors='coerce')
-        
-        rows.append([
-            date, page_path, active_users, sessions, pageviews, bounce_rate, avg_session_duration, new_users
-        ])
-    
-    # Create DataFrame for metrics by landing page
-    df_landing_page_metrics = pd.DataFrame(rows, columns=[
-        'Date', 'Page Path', 'Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users'
-    ])
-    
-    # Convert all numeric columns to proper numeric types
-    numeric_cols = ['Total Visitors', 'Sessions', 'Pageviews', 'Bounce Rate', 'Average Session Duration', 'New Users']
-    for col in numeric_cols:
-        df_landing_page_metrics[col] = pd.to_numeric(df_landing_page_metrics[col], errors='coerce')
-    
-    # Process data for easier handling
-    df_landing_page_metrics.sort_values(by='Page Path', inplace=True)
-    
-    return df_landing_page_metrics
+
+# Progress callback that drives a Streamlit progress bar as report pages arrive. The bar is only drawn
+# once the first page comes in, so loads served from the warehouse show nothing; pass an st.empty()
+# placeholder as container to be able to clear it afterwards.
+def streamlit_progress(label, container=None):
+    bar = {}
+
+    def update(rows_fetched, row_count):
+        fraction = min(rows_fetched / row_count, 1.0) if row_count else 1.0
+        text = f"{label} ({rows_fetched:,} of {row_count:,} rows)"
+        if "widget" not in bar:
+            bar["widget"] = (container or st).progress(fraction, text=text)
+        else:
+            bar["widget"].progress(fraction, text=text)
+
+    return update
+
+
+# Warehouse table holding a report spec's rows; specs asking for different rows never share one
+def report_table(spec):
+    return ga4_warehouse.table_name(spec["dimensions"], spec["metrics"], spec.get("filter"))
+
+
+# Sync several reports (name -> report spec) over the same date range into the local warehouse, fetching
+# only missing days, and return a WarehouseSlice per report name for reading the range back. Settled days
+# are served from the warehouse; days GA4 may still revise are re-fetched once
+# ga4_warehouse.RESYNC_INTERVAL has passed, or on every call with refresh. Fetched pages go straight
+# into the warehouse; progress is as for run_report_batches.
+@timed("ga4.sync_reports")
+def sync_reports(specs, start_date, end_date, tenant=None, priority=call_queue.INTERACTIVE, progress=None, refresh=False):
+    start, end = ga4_warehouse.resolve_date(start_date), ga4_warehouse.resolve_date(end_date)
+    target_property = ga4_target(tenant)[0]
+
+    # Tenants each get their own warehouse file
+    path = tenants.cache_path(tenant, "ga4_warehouse.sqlite") if tenant else ga4_warehouse.WAREHOUSE_PATH
+    conn = ga4_warehouse.connect(path)
+
+    try:
+        # Work out which days each report still needs from GA4
+        jobs = []
+        for spec in specs.values():
+            missing_days = ga4_warehouse.days_to_sync(
+                conn, target_property, report_table(spec), start, end,
+                max_age=timedelta(0) if refresh else ga4_warehouse.RESYNC_INTERVAL,
+            )
+            for range_start, range_end in ga4_warehouse.contiguous_ranges(missing_days):
+                jobs.append((spec, range_start.isoformat(), range_end.isoformat()))
+
+        # Fetch all missing ranges together, storing each page as it arrives
+        for (spec, range_start, range_end), pages in run_report_batches(jobs, tenant=tenant, priority=priority, progress=progress):
+            ga4_warehouse.store_range(
+                conn, target_property, report_table(spec), pages,
+                date.fromisoformat(range_start), date.fromisoformat(range_end),
+            )
+
+        slices = {
+            name: ga4_warehouse.slice_range(conn, path, target_property, report_table(spec), spec["columns"], start, end)
+            for name, spec in specs.items()
+        }
+    finally:
+        conn.close()
+
+    return slices
+
+
+# Fetch several reports over the same date range as frames, served from the warehouse after syncing it
+@timed("ga4.fetch_reports")
+def fetch_reports(report_names, start_date, end_date, tenant=None, priority=call_queue.INTERACTIVE, progress=None, refresh=False):
+    specs = {name: REPORT_SPECS[name] for name in report_names}
+    slices = sync_reports(specs, start_date, end_date, tenant=tenant, priority=priority, progress=progress, refresh=refresh)
+    return {name: shape_frame(REPORT_SPECS[name], ga4_warehouse.load_slice(slices[name])) for name in report_names}
+
+
+# Fetch a single report by name
+def fetch_report(report_name, start_date, end_date, tenant=None):
+    return fetch_reports([report_name], start_date, end_date, tenant=tenant)[report_name]
+
+
+# Get traffic by source
+def fetch_metrics_by_source(start_date, end_date):
+    return fetch_report("source", start_date, end_date)
+
+# Get data by landing page
+def fetch_metrics_by_landing_page(start_date, end_date):
+    return fetch_report("landing_page", start_date, end_date)
 
 
 #  Get Conversions
 def fetch_metrics_by_event(start_date, end_date):
-    # Define the request to pull data aggregated by event name
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="eventName"), Dimension(name="date")],  # Added 'date' dimension
-        metrics=[
-            Metric(name="eventCount"),  # Focus on the event count
-        ],
-        date_ranges=[DateRange(start_date=start_date, end_date=end_date)],  # Define date range
-    )
-
-    response = client.run_report(request)
-    
-    # Parse the response and create the dataframe for event-level metrics
-    rows = []
-    for row in response.rows:
-        event_name = row.dimension_values[0].value
-        date = row.dimension_values[1].value  # Capture the date
-        
-        # Convert event count to numeric (with coercion to handle non-numeric data)
-        event_count = pd.to_numeric(row.metric_values[0].value, errors='coerce')
-        
-        rows.append([date, event_name, event_count])
-    
-    # Create DataFrame for metrics by event name
-    df_event_metrics = pd.DataFrame(rows, columns=['Date', 'Event Name', 'Event Count'])
-    
-    # Convert the 'Event Count' to numeric
-    df_event_metrics['Event Count'] = pd.to_numeric(df_event_metrics['Event Count'], errors='coerce')
-    
-    # Sort data for easier handling
-    df_event_metrics.sort_values(by='Event Count', ascending=False, inplace=True)
-    
-    return df_event_metrics
+    return fetch_report("event", start_date, end_date)
 
 
 # Summarize acquisition data
+@timed("ga4.summarize_acquisition_sources")
 def summarize_acquisition_sources(acquisition_data, event_data):
-    # Ensure the Date column is in datetime format and convert to date
-    acquisition_data['Date'] = pd.to_datetime(acquisition_data['Date'], errors='coerce').dt.date
+    # Ensure the Date column is in datetime format (a no-op for fetched frames)
+    dates = pd.to_datetime(acquisition_data['Date'], errors='coerce')
 
     # Get the date 30 days ago
-    today = date.today()
-    start_of_period = today - timedelta(days=30)
+    start_of_period = pd.Timestamp(date.today() - timedelta(days=30))
     
-    # Filter data for the last 30 days
-    monthly_data = acquisition_data[acquisition_data['Date'] >= start_of_period]
+    # Filter data for the last 30 days, on a copy so the caller's frame is left untouched
+    monthly_data = acquisition_data[dates >= start_of_period].copy()
     
     # Check if required columns are in the dataframe
     required_cols = ["Session Source", "Sessions", "Bounce Rate"]
@@ -185,7 +411,7 @@ def summarize_acquisition_sources(acquisition_data, event_data):
     monthly_data['Event Count'].fillna(0, inplace=True)
 
     # Group by Session Source to get aggregated metrics
-    source_summary = monthly_data.groupby("Session Source").agg(
+    source_summary = monthly_data.groupby("Session Source", observed=True).agg(
         Sessions=("Sessions", "sum"),
         Bounce_Rate=("Bounce Rate", "mean"),
         Conversions=("Event Count", "sum")  # Use Event Count for conversions (leads)
@@ -200,10 +426,15 @@ def summarize_acquisition_sources(acquisition_data, event_data):
     return source_summary
 
 # Summarize Landing Pages
+@stage("landing_page_summary", inputs=("landing_page_data", "event_data"))
+@timed("ga4.summarize_landing_pages")
 def summarize_landing_pages(acquisition_data, event_data):
     # Ensure that 'Page Path' exists in acquisition_data or handle differently
     if 'Page Path' not in acquisition_data.columns:
         raise ValueError("Data does not contain a 'Page Path' column.")
+
+    # Work on a copy so the caller's frame is left untouched
+    acquisition_data = acquisition_data.copy()
     
     # Convert columns to numeric, if possible, and fill NaNs
     numeric_cols = ["Sessions", "Bounce Rate", "Total Visitors", "Pageviews", "Average Session Duration"]
@@ -211,7 +442,7 @@ def summarize_landing_pages(acquisition_data, event_data):
         acquisition_data[col] = pd.to_numeric(acquisition_data[col], errors='coerce').fillna(0)
 
     # Create a column for 'Leads', filtering event data where Event Name is 'generate_lead'
-    event_data_filtered = event_data[event_data['Event Name'] == 'generate_lead']
+    event_data_filtered = event_data[event_data['Event Name'] == 'generate_lead'].copy()
     
     # Ensure that 'Event Count' is numeric
     event_data_filtered['Event Count'] = pd.to_numeric(event_data_filtered['Event Count'], errors='coerce').fillna(0)
@@ -221,7 +452,7 @@ def summarize_landing_pages(acquisition_data, event_data):
     acquisition_data.loc[acquisition_data['Page Path'] == '/contact', 'Leads'] = event_data_filtered['Event Count'].sum()
 
     # Group by Page Path to get aggregated metrics
-    page_summary = acquisition_data.groupby("Page Path").agg(
+    page_summary = acquisition_data.groupby("Page Path", observed=True).agg(
         Sessions=("Sessions", "sum"),
         Total_Visitors=("Total Visitors", "sum"),
         Pageviews=("Pageviews", "sum"),
@@ -240,12 +471,17 @@ def summarize_landing_pages(acquisition_data, event_data):
 
 
 # Get this months summary
+@stage("monthly_summary", inputs=("source_data", "event_data"))
+@timed("ga4.summarize_monthly_data")
 def summarize_monthly_data(monthly_data, event_data):
-    # Ensure the Date column is in datetime format, then convert to date
+    # Ensure the Date column is in datetime format (a no-op for fetched frames)
     if 'Date' not in monthly_data.columns:
         raise ValueError("Data does not contain a 'Date' column.")
+
+    # Work on a copy so the caller's frame is left untouched
+    monthly_data = monthly_data.copy()
     
-    monthly_data['Date'] = pd.to_datetime(monthly_data['Date'], errors='coerce').dt.date
+    monthly_data['Date'] = pd.to_datetime(monthly_data['Date'], errors='coerce')
     
     # Check if required columns are in the dataframe
     required_cols = ["Total Visitors", "New Users", "Sessions", "Average Session Duration", "Session Source"]
@@ -284,7 +520,7 @@ def summarize_monthly_data(monthly_data, event_data):
     })
 
     # Summarize acquisition metrics (using Event Count for leads)
-    acquisition_summary = monthly_data.groupby("Session Source").agg(
+    acquisition_summary = monthly_data.groupby("Session Source", observed=True).agg(
         Visitors=("Total Visitors", "sum"),
         Sessions=("Sessions", "sum"),
         Leads=("Leads", "sum")  # Sum of leads for the Contact page
@@ -293,9 +529,148 @@ def summarize_monthly_data(monthly_data, event_data):
     return summary_df, acquisition_summary
 
 
+# The headline metrics half of the monthly summary
+@stage("current_summary", inputs=("monthly_summary",))
+def select_current_summary(monthly_summary):
+    return monthly_summary[0]
+
+
+# The per-source half of the monthly summary
+@stage("acquisition_summary", inputs=("monthly_summary",))
+def select_acquisition_summary(monthly_summary):
+    return monthly_summary[1]
+
+
+# The period of the same length immediately before a (start, end) date window
+def previous_window(date_window):
+    start, end = date_window
+    return start - (end - start) - timedelta(days=1), start - timedelta(days=1)
+
+
+# Headline metrics with the previous period's values and the change between them
+def add_previous_period(current_summary, previous_summary):
+    comparison = current_summary.copy()
+
+    # Both summaries list the metrics in the same order
+    comparison["Previous Value"] = previous_summary["Value"].to_numpy()
+
+    # No change is reported for metrics the previous period had none of
+    previous_values = comparison["Previous Value"].where(comparison["Previous Value"] != 0)
+    comparison["Change (%)"] = ((comparison["Value"] - previous_values) / previous_values * 100).round(1)
+
+    return comparison
+
+
+# Pages of a synced report read back from the warehouse, in the report frame schema
+def slice_pages(report_rows):
+    return (apply_schema(chunk) for chunk in ga4_warehouse.iter_slice(report_rows, chunksize=PAGE_SIZE))
+
+
+# The synced reports loaded whole as report frames, for the summaries over everything they hold
+@stage("source_data", inputs=("source_rows",))
+def load_source_data(source_rows):
+    return apply_schema(ga4_warehouse.load_slice(source_rows))
+
+
+@stage("landing_page_data", inputs=("landing_page_rows",))
+def load_landing_page_data(landing_page_rows):
+    return apply_schema(ga4_warehouse.load_slice(landing_page_rows))
+
+
+@stage("event_data", inputs=("event_rows",))
+def load_event_data(event_rows):
+    return apply_schema(ga4_warehouse.load_slice(event_rows))
+
+
+# Daily rollups of the synced reports, so any date window is summarized without regrouping the rows.
+# They are folded from the warehouse a page at a time, so the rows are never all in memory together,
+# and rebuilt only when a day of their slice has been re-synced.
+@stage("source_rollup", inputs=("source_rows",))
+@timed("ga4.build_source_rollup")
+def build_source_rollup(source_rows):
+    return build_rollup_from_pages(slice_pages(source_rows), "Session Source", ["Total Visitors", "New Users", "Sessions", "Average Session Duration"])
+
+
+@stage("landing_page_rollup", inputs=("landing_page_rows",))
+@timed("ga4.build_landing_page_rollup")
+def build_landing_page_rollup(landing_page_rows):
+    return build_rollup_from_pages(slice_pages(landing_page_rows), "Page Path", ["Sessions", "Total Visitors", "Pageviews", "Average Session Duration", "Bounce Rate"])
+
+
+@stage("event_rollup", inputs=("event_rows",))
+@timed("ga4.build_event_rollup")
+def build_event_rollup(event_rows):
+    return build_rollup_from_pages(slice_pages(event_rows), "Event Name", ["Event Count"])
+
+
+# Total "generate_lead" events in a date window
+def window_leads(event_rollup, date_window):
+    return window_totals(event_rollup, *date_window, groups=["generate_lead"])["Event Count"].sum()
+
+
+# summarize_monthly_data for any (start, end) date window, read off the source and event rollups
+@stage("window_monthly_summary", inputs=("source_rollup", "event_rollup", "date_window"))
+@timed("ga4.summarize_monthly_window")
+def summarize_monthly_window(source_rollup, event_rollup, date_window):
+    sources = window_totals(source_rollup, *date_window)
+    total_leads = window_leads(event_rollup, date_window)
+
+    # Means are over rows, as in summarize_monthly_data; an empty window shows zero rather than NaN
+    total_rows = sources[ROWS_COLUMN].sum()
+    avg_time_on_site = round(sources["Average Session Duration"].sum() / total_rows, 2) if total_rows else 0.0
+
+    summary_df = pd.DataFrame({
+        "Metric": ["Total Visitors", "New Visitors", "Total Sessions", "Total Leads", "Average Session Duration"],
+        "Value": [sources["Total Visitors"].sum(), sources["New Users"].sum(), sources["Sessions"].sum(), total_leads, avg_time_on_site]
+    })
+
+    # Leads are credited once per row of the Contact source, matching summarize_monthly_data
+    acquisition_summary = pd.DataFrame({
+        "Session Source": sources["Session Source"],
+        "Visitors": sources["Total Visitors"],
+        "Sessions": sources["Sessions"],
+        "Leads": np.where(sources["Session Source"] == "Contact", total_leads * sources[ROWS_COLUMN], 0),
+    })
+
+    return summary_df, acquisition_summary
+
+
+# The window's headline metrics next to the same metrics for the period before it, from the same rollups
+@stage("monthly_comparison", inputs=("window_monthly_summary", "source_rollup", "event_rollup", "date_window"))
+@timed("ga4.compare_monthly_summary")
+def compare_monthly_summary(window_monthly_summary, source_rollup, event_rollup, date_window):
+    previous = summarize_monthly_window(source_rollup, event_rollup, previous_window(date_window))[0]
+    return add_previous_period(window_monthly_summary[0], previous)
+
+
+# summarize_landing_pages for any (start, end) date window, read off the landing page and event rollups
+@stage("window_landing_page_summary", inputs=("landing_page_rollup", "event_rollup", "date_window"))
+@timed("ga4.summarize_landing_pages_window")
+def summarize_landing_pages_window(landing_page_rollup, event_rollup, date_window):
+    pages = window_totals(landing_page_rollup, *date_window)
+    total_leads = window_leads(event_rollup, date_window)
+
+    page_summary = pd.DataFrame({
+        "Page Path": pages["Page Path"],
+        "Sessions": pages["Sessions"],
+        "Total_Visitors": pages["Total Visitors"],
+        "Pageviews": pages["Pageviews"],
+        "Avg_Session_Duration": pages["Average Session Duration"] / pages[ROWS_COLUMN],
+        "Bounce_Rate": pages["Bounce Rate"] / pages[ROWS_COLUMN],
+        # Every /contact row carries the window's leads, matching summarize_landing_pages
+        "Conversions": np.where(pages["Page Path"] == "/contact", total_leads * pages[ROWS_COLUMN], 0),
+    })
+
+    # Calculate Conversion Rate
+    page_summary["Conversion Rate (%)"] = (page_summary["Conversions"] / page_summary["Sessions"] * 100).round(2)
+
+    # Sort by Sessions in descending order
+    return page_summary.sort_values(by="Sessions", ascending=False)
 
-# Generate all metrics
-def generate_all_metrics_copy(current_summary_df):
+
+# Build the markdown copy for all metrics, without rendering it
+@stage("metrics_copy", inputs=("current_summary",))
+def build_metrics_copy(current_summary_df):
     # List of metrics and their descriptions
     metrics = {
         "Total Visitors": "the number of people that have visited your site.",
@@ -305,11 +680,7 @@ def generate_all_metrics_copy(current_summary_df):
         "Average Session Duration": "the average amount of time users spent on your site per session."
     }
     
-    st.markdown(
-        "<span style='font-size:25px;'>📊 **Data Overview: Last 30 Days**</span>", 
-        unsafe_allow_html=True
-    )
-    
+    lines = []
     for metric_name, description in metrics.items():
         # Extract metric values for the current and last month
         current_value = current_summary_df.loc[current_summary_df['Metric'] == metric_name, 'Value'].values[0]
@@ -323,15 +694,32 @@ def generate_all_metrics_copy(current_summary_df):
             display_metric = f"**Average Time on Site: {round(current_value)} seconds**"
         else:
             display_metric = f"**{round(current_value)} {metric_name}**"
+
+        # Summaries compared with the previous period show the change next to the value
+        if "Change (%)" in current_summary_df.columns:
+            change = current_summary_df.loc[current_summary_df['Metric'] == metric_name, 'Change (%)'].values[0]
+            if pd.notna(change):
+                display_metric += f" ({change:+.1f}% vs previous period)"
         
         # Generate the display copy for each metric
-        st.markdown(
-            f"{display_metric} - _{description}_<br>", 
-            unsafe_allow_html=True
-        )
+        lines.append(f"{display_metric} - _{description}_<br>")
+
+    return lines
 
 
-def plot_acquisition_pie_chart_plotly(acquisition_summary):
+# Generate all metrics under a heading naming the period they cover
+def generate_all_metrics_copy(current_summary_df, period_label="Last 30 Days"):
+    st.markdown(f"<span style='font-size:25px;'>📊 **Data Overview: {period_label}**</span>", unsafe_allow_html=True)
+    for line in build_metrics_copy(current_summary_df):
+        st.markdown(line, unsafe_allow_html=True)
+
+
+# Build the traffic source donut chart
+@stage("acquisition_pie_chart", inputs=("acquisition_summary",))
+@timed("plot.build_acquisition_pie_chart")
+def build_acquisition_pie_chart(acquisition_summary):
+    import plotly.express as px
+
     # Filter data for pie chart
     source_data = acquisition_summary[['Session Source', 'Visitors']].copy()
     source_data = source_data[source_data['Visitors'] > 0]  # Exclude sources with no visitors
@@ -349,14 +737,24 @@ def plot_acquisition_pie_chart_plotly(acquisition_summary):
     # Update layout to place labels outside
     fig.update_traces(textposition='outside', textinfo='label+percent', showlegend=False)
 
+    return fig
+
+
+@timed("plot.acquisition_pie_chart")
+def plot_acquisition_pie_chart_plotly(fig):
     # Display in Streamlit
     st.plotly_chart(fig, use_container_width=True)
 
 
-def describe_top_sources(acquisition_summary):
-    # Sort by Visitors and take the top 3
-    top_sources = acquisition_summary.sort_values(by='Visitors', ascending=False).head(3)
-    
+# Sort by Visitors and take the top 3
+@stage("top_sources", inputs=("acquisition_summary",))
+def select_top_sources(acquisition_summary):
+    return acquisition_summary.sort_values(by='Visitors', ascending=False).head(3)
+
+
+# Headline and description for each top source, without rendering them
+@stage("top_sources_copy", inputs=("top_sources",))
+def build_top_sources_copy(top_sources):
     # Hard-coded descriptions for specific sources
     descriptions = {
         "google": (
@@ -374,19 +772,32 @@ def describe_top_sources(acquisition_summary):
         )
     }
     
+    copy = []
+    for _, row in top_sources.iterrows():
+        source = row['Session Source']
+        visitors = row['Visitors']
+        
+        copy.append((
+            f"**{source} - {visitors} visitors**",
+            f"{descriptions.get(source, 'Description not available for this source.')}"
+        ))
+
+    return copy
+
+
+def describe_top_sources(top_sources):
     # Display each top source with description
     st.markdown(
     "<span style='font-size:18px;'>**Top Sources Overview**</span>", 
     unsafe_allow_html=True
     )
-    for _, row in top_sources.iterrows():
-        source = row['Session Source']
-        visitors = row['Visitors']
-        
-        st.markdown(f"**{source} - {visitors} visitors**")
-        st.markdown(f"{descriptions.get(source, 'Description not available for this source.')}")
+    for headline, description in build_top_sources_copy(top_sources):
+        st.markdown(headline)
+        st.markdown(description)
 
-def generate_page_summary(landing_page_summary):
+# Display copy for each key page plus the matching summary for the LLM, without rendering either
+@stage("page_summary_copy", inputs=("landing_page_summary",))
+def build_page_summary_copy(landing_page_summary):
     # Map page paths to friendly names
     page_name_map = {
         "/": "Home",
@@ -399,13 +810,14 @@ def generate_page_summary(landing_page_summary):
     }
 
     # Filter the DataFrame to only include the specified pages
-    filtered_summary = landing_page_summary[landing_page_summary["Page Path"].isin(page_name_map.keys())]
+    filtered_summary = landing_page_summary[landing_page_summary["Page Path"].isin(page_name_map.keys())].copy()
 
     # Rename Page Path to friendly names
     filtered_summary["Page Name"] = filtered_summary["Page Path"].map(page_name_map)
 
     # Initialize a summary string to track all page info for LLM
     llm_summary = "### Page Performance Summary\n\n"
+    display_lines = []
 
     # Display summary for each relevant page and append to LLM summary
     for _, row in filtered_summary.iterrows():
@@ -417,14 +829,13 @@ def generate_page_summary(landing_page_summary):
             f"|&nbsp;&nbsp;Conversion Rate: {row['Conversion Rate (%)']}%" if page_name == "Contact" else ""
         )
         
-        # Display the page summary
-        st.markdown(
+        # Display copy for the page summary
+        display_lines.append(
             f"**{page_name}**<br>"
             f"Visitors: {visitors} &nbsp;&nbsp;|&nbsp;&nbsp; "
             f"Sessions: {sessions} &nbsp;&nbsp;|&nbsp;&nbsp; "
             f"Average Session Duration: {avg_session_duration} seconds &nbsp;&nbsp; "
-            f"{conversion_rate}",
-            unsafe_allow_html=True
+            f"{conversion_rate}"
         )
         
         # Append to LLM summary
@@ -437,5 +848,15 @@ def generate_page_summary(landing_page_summary):
             llm_summary += f", Conversion Rate: {row['Conversion Rate (%)']}%"
         llm_summary += "\n\n"
 
+    return display_lines, llm_summary
+
+
+def generate_page_summary(landing_page_summary):
+    display_lines, llm_summary = build_page_summary_copy(landing_page_summary)
+
+    # Display summary for each relevant page
+    for line in display_lines:
+        st.markdown(line, unsafe_allow_html=True)
+
     # Store LLM summary in session state for later use
     st.session_state["page_summary_llm"] = llm_summary
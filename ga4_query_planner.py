@@ -0,0 +1,67 @@
+from collections import namedtuple
+import call_queue
+from instrumentation import timed
+from ga4_data_pull import COLUMN_NAMES, sync_reports
+
+# What each dashboard report needs from GA4 per day. The dashboard answers every date window (and the
+# period before it) from daily rollups of these rows (see rollup_cube), so each keeps the date dimension,
+# but asks only for the metrics its window summary reads and lets GA4 drop the rows it never looks at.
+SUMMARY_NEEDS = {
+    "source": {"dimensions": ["sessionSource"], "metrics": ["activeUsers", "newUsers", "sessions", "averageSessionDuration"]},
+    "landing_page": {"dimensions": ["pagePath"], "metrics": ["sessions", "activeUsers", "screenPageViews", "averageSessionDuration", "bounceRate"]},
+    "event": {"dimensions": ["eventName"], "metrics": ["eventCount"], "filter": ("eventName", "generate_lead")},
+}
+
+# Reports behind the homepage dashboard
+DASHBOARD_SUMMARIES = ["source", "landing_page", "event"]
+
+# GA4 accepts at most 10 metrics per request
+MAX_METRICS = 10
+
+# One planned daily GA4 request and the summaries it answers. filter is an exact (dimension, value) match.
+QueryPlan = namedtuple("QueryPlan", ["dimensions", "metrics", "filter", "summaries"])
+
+
+# Fold the summaries into as few requests as possible: summaries with the same dimensions and filter
+# share a request, as long as the merged metrics stay within GA4's limit
+def plan_queries(summaries):
+    plans = []
+
+    for name in summaries:
+        need = SUMMARY_NEEDS[name]
+        dimensions, metrics, dimension_filter = list(need["dimensions"]), list(need["metrics"]), need.get("filter")
+
+        for i, plan in enumerate(plans):
+            merged_metrics = plan.metrics + [metric for metric in metrics if metric not in plan.metrics]
+            if plan.dimensions == dimensions and plan.filter == dimension_filter and len(merged_metrics) <= MAX_METRICS:
+                plans[i] = QueryPlan(dimensions, merged_metrics, dimension_filter, plan.summaries + [name])
+                break
+        else:
+            plans.append(QueryPlan(dimensions, metrics, dimension_filter, [name]))
+
+    return plans
+
+
+# The report spec (see ga4_data_pull.REPORT_SPECS) syncing a plan's rows day by day
+def plan_spec(plan):
+    return {
+        "dimensions": plan.dimensions + ["date"],
+        "metrics": plan.metrics,
+        "filter": plan.filter,
+        "columns": ["Date"] + [COLUMN_NAMES[name] for name in plan.dimensions + plan.metrics],
+        "sort_by": COLUMN_NAMES[plan.dimensions[0]],
+        "ascending": True,
+    }
+
+
+# Sync the planned daily rows of the dashboard reports into the warehouse over a date range and return
+# a WarehouseSlice per summary name. Only days the warehouse does not hold yet, or that GA4 may still
+# revise, are requested, batched into as few calls as the plans allow (see ga4_data_pull.sync_reports).
+@timed("ga4.sync_dashboard_reports")
+def sync_dashboard_reports(start_date, end_date, tenant=None, priority=call_queue.INTERACTIVE, progress=None, refresh=False, summaries=DASHBOARD_SUMMARIES):
+    plans = plan_queries(summaries)
+    specs = {"+".join(plan.summaries): plan_spec(plan) for plan in plans}
+    slices = sync_reports(specs, start_date, end_date, tenant=tenant, priority=priority, progress=progress, refresh=refresh)
+
+    # Summaries sharing a request read their columns off the same slice
+    return {name: slices["+".join(plan.summaries)] for plan in plans for name in plan.summaries}
@@ -0,0 +1,186 @@
+import time
+import call_queue
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from instrumentation import span
+
+# Every GA4 Data API call goes through here. Calls queue per property and are started in priority
+# order (dashboard views before background refreshes), no more than MAX_CONCURRENT_REQUESTS at a
+# time, paced so the hourly tokens GA4 reports back (return_property_quota) last until the top of
+# the hour. Quota and transient server errors are retried with jittered exponential backoff.
+# Priorities, queueing and backoff come from call_queue.
+
+# GA4 allows 10 concurrent requests per property; keep a little headroom for other processes
+MAX_CONCURRENT_REQUESTS = 8
+
+# Hourly tokens background calls leave untouched, so dashboard views keep working when a refresh
+# has used up most of the hour. Background calls wait for the next hour below this.
+BACKGROUND_TOKEN_RESERVE = 2000
+
+# Hourly quotas GA4 reports on; the lower remaining value of the two is the one that binds
+HOURLY_QUOTAS = ["tokens_per_hour", "tokens_per_project_per_hour"]
+
+# GA4 daily quotas reset at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# property id -> {"in_flight", "remaining" (hourly tokens, None until known), "hour" (clock hour of that
+# reading), "tokens_per_day", "day" (date of that reading), "cost" (average tokens per call),
+# "next_start_at" (priority -> monotonic time its next call may start)}
+property_state = {}
+
+# Queued calls, one lane per property; a call starts when it is the first for its property
+queue = call_queue.new_queue()
+
+
+def state_for(property_id):
+    return property_state.setdefault(property_id, {
+        "in_flight": 0, "remaining": None, "hour": None, "tokens_per_day": None, "day": None, "cost": None,
+        "next_start_at": {call_queue.INTERACTIVE: 0.0, call_queue.BACKGROUND: 0.0},
+    })
+
+
+def current_hour():
+    return int(time.time() // 3600)
+
+
+def seconds_to_next_hour():
+    return 3600 - time.time() % 3600
+
+
+# Hourly tokens left as of the last response, or None when unknown or read in an earlier hour
+def hourly_remaining(state):
+    return state["remaining"] if state["hour"] == current_hour() else None
+
+
+def quota_day():
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+
+# Whether the last response of today's quota day said the property's daily tokens are used up
+def daily_exhausted(state):
+    return state["day"] == quota_day() and state["tokens_per_day"] is not None and state["tokens_per_day"] <= 0
+
+
+# Seconds between call starts that spreads the usable hourly tokens over the rest of the hour.
+# Background calls spread what is left above the reserve; dashboard views run unpaced until the
+# hour is down to the reserve, then spread that.
+def pacing_interval(state, priority):
+    remaining = hourly_remaining(state)
+    if remaining is None or not state["cost"]:
+        return 0.0
+    if priority == call_queue.BACKGROUND:
+        usable = remaining - BACKGROUND_TOKEN_RESERVE
+    elif remaining > BACKGROUND_TOKEN_RESERVE:
+        return 0.0
+    else:
+        usable = remaining
+    if usable <= 0:
+        return 0.0
+    return state["cost"] * seconds_to_next_hour() / usable
+
+
+# How long a queued call must still wait, or 0 when it may start now
+def admission_delay(state, priority):
+    if state["in_flight"] >= MAX_CONCURRENT_REQUESTS:
+        return 1.0
+    remaining = hourly_remaining(state)
+    if priority == call_queue.BACKGROUND and remaining is not None and remaining < BACKGROUND_TOKEN_RESERVE:
+        return seconds_to_next_hour()
+    # Each priority is paced on its own, so dashboard views never wait out a background call's interval
+    return max(state["next_start_at"][priority] - time.monotonic(), 0.0)
+
+
+# Block until the call may start, then take a concurrency slot
+def acquire_slot(property_id, priority):
+    with queue["condition"]:
+        state = state_for(property_id)
+        call_queue.wait_turn(queue, priority, lambda: admission_delay(state, priority), lane=property_id)
+
+        state["in_flight"] += 1
+        state["next_start_at"][priority] = time.monotonic() + pacing_interval(state, priority)
+        queue["condition"].notify_all()
+
+
+# Give the slot back and record what the response said about the property's quota
+def release_slot(property_id, quotas=(), pause=0.0):
+    with queue["condition"]:
+        state = state_for(property_id)
+        state["in_flight"] -= 1
+
+        # A batch call reports one quota per report: it cost their sum and left the lowest remaining
+        hourly = [[getattr(quota, name) for name in HOURLY_QUOTAS if quota.HasField(name)] for quota in quotas]
+        hourly = [statuses for statuses in hourly if statuses]
+        if hourly:
+            state["remaining"] = min(status.remaining for statuses in hourly for status in statuses)
+            state["hour"] = current_hour()
+            cost = sum(max(status.consumed for status in statuses) for statuses in hourly)
+            state["cost"] = cost if state["cost"] is None else 0.7 * state["cost"] + 0.3 * cost
+
+        daily = [quota.tokens_per_day.remaining for quota in quotas if quota.HasField("tokens_per_day")]
+        if daily:
+            state["tokens_per_day"] = min(daily)
+            state["day"] = quota_day()
+
+        # After a quota or server error, every queued call for the property backs off, not just this one
+        if pause:
+            paused_until = time.monotonic() + pause
+            for queued_priority, next_start_at in state["next_start_at"].items():
+                state["next_start_at"][queued_priority] = max(next_start_at, paused_until)
+
+        queue["condition"].notify_all()
+
+
+# PropertyQuota messages of a RunReportResponse or of every report in a BatchRunReportsResponse
+def response_quotas(response):
+    raw = type(response).pb(response)
+    reports = raw.reports if hasattr(raw, "reports") else [raw]
+    return [report.property_quota for report in reports if report.HasField("property_quota")]
+
+
+# Quota and transient server errors are worth retrying, except an exhausted daily quota: GA4 won't
+# have tokens again until tomorrow
+def is_retryable(ex, state=None):
+    from google.api_core import exceptions
+    if isinstance(ex, exceptions.ResourceExhausted) and (
+            (state is not None and daily_exhausted(state)) or "per day" in str(ex).lower()):
+        return False
+    return isinstance(ex, (
+        exceptions.ResourceExhausted, exceptions.TooManyRequests, exceptions.ServiceUnavailable,
+        exceptions.InternalServerError, exceptions.DeadlineExceeded, exceptions.Aborted,
+    ))
+
+
+# Send a GA4 call (e.g. client.run_report, client.batch_run_reports) through the scheduler.
+# Requests should set return_property_quota so the scheduler can pace against the real quota.
+# A failed attempt pushes back the property's next start, so the retry waits in the queue.
+def run_scheduled(method, request, property_id, priority=call_queue.INTERACTIVE):
+    for attempt in range(call_queue.MAX_RETRIES + 1):
+        with span("ga4.scheduler_wait"):
+            acquire_slot(property_id, priority)
+
+        quotas, pause = (), 0.0
+        try:
+            response = method(request)
+            quotas = response_quotas(response)
+            return response
+        except Exception as ex:
+            if attempt == call_queue.MAX_RETRIES or not is_retryable(ex, state_for(property_id)):
+                raise
+            pause = call_queue.backoff_delay(attempt)
+        finally:
+            release_slot(property_id, quotas, pause)
+
+
+# Latest known quota for each property, for display and logging
+def quota_status():
+    with queue["condition"]:
+        return {
+            property_id: {
+                "in_flight": state["in_flight"],
+                "hourly_tokens_remaining": hourly_remaining(state),
+                "daily_tokens_remaining": state["tokens_per_day"],
+                "average_call_cost": state["cost"],
+                "queued": call_queue.queued(queue, property_id),
+            }
+            for property_id, state in property_state.items()
+        }
@@ -0,0 +1,189 @@
+import os
+import re
+import sqlite3
+import hashlib
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+import pandas as pd
+
+# Location of the local SQLite warehouse holding previously fetched GA4 rows
+WAREHOUSE_PATH = os.environ.get("GA4_WAREHOUSE_PATH", os.path.join(".cache", "ga4_warehouse.sqlite"))
+
+# GA4 keeps revising the most recent days, so re-fetch a day until it was synced this long after it ended
+SETTLING_DAYS = 3
+
+# Days that have not settled yet are re-fetched at most this often, so reruns in between are served locally
+RESYNC_INTERVAL = timedelta(minutes=int(os.environ.get("GA4_RESYNC_MINUTES", 15)))
+
+# GA4 report dates are YYYYMMDD strings
+GA4_DATE_FORMAT = "%Y%m%d"
+
+# A date range of one report table as it stood when the slice was taken. version changes whenever a day
+# in the range is re-synced, so a slice can stand in for its rows, e.g. as a report_graph source.
+WarehouseSlice = namedtuple("WarehouseSlice", ["path", "property_id", "report_table", "columns", "start", "end", "version"])
+
+
+# Open a connection to the warehouse and make sure the bookkeeping table exists
+def connect(path=None):
+    path = path or WAREHOUSE_PATH
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS synced_days ("
+        "property_id TEXT, report_table TEXT, day TEXT, synced_at TEXT, "
+        "PRIMARY KEY (property_id, report_table, day))"
+    )
+    return conn
+
+
+# Resolve a GA4 date string ("yesterday", "30daysAgo", "2024-01-31") to a date
+def resolve_date(value, today=None):
+    today = today or date.today()
+    if isinstance(value, date):
+        return value
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - timedelta(days=1)
+
+    match = re.fullmatch(r"(\d+)daysAgo", value)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+# Each dimension/metric set (and dimension filter) gets its own table so reports never share columns or rows
+def table_name(dimensions, metrics, dimension_filter=None):
+    signature = ",".join(dimensions) + "|" + ",".join(metrics)
+    if dimension_filter:
+        signature += "|" + "=".join(dimension_filter)
+    return "report_" + hashlib.sha1(signature.encode("utf-8")).hexdigest()[:12]
+
+
+# Days in the range that have never been synced, or were synced before they settled and more than
+# max_age ago (pass timedelta(0) to re-fetch every unsettled day)
+def days_to_sync(conn, property_id, report_table, start, end, now=None, max_age=RESYNC_INTERVAL):
+    now = now or datetime.now()
+    today = now.date()
+    synced = dict(conn.execute(
+        "SELECT day, synced_at FROM synced_days WHERE property_id = ? AND report_table = ? AND day BETWEEN ? AND ?",
+        (str(property_id), report_table, start.strftime(GA4_DATE_FORMAT), end.strftime(GA4_DATE_FORMAT)),
+    ).fetchall())
+
+    missing = []
+    day = start
+    while day <= end:
+        synced_at = synced.get(day.strftime(GA4_DATE_FORMAT))
+        if synced_at is None:
+            missing.append(day)
+        else:
+            synced_at = datetime.fromisoformat(synced_at)
+            if (synced_at.date() - day).days < SETTLING_DAYS and now - synced_at >= max_age:
+                missing.append(day)
+        day += timedelta(days=1)
+
+    # Nothing to fetch for days that have not happened yet
+    return [day for day in missing if day <= today]
+
+
+# Collapse a sorted list of days into contiguous (start, end) ranges
+def contiguous_ranges(days):
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+# Replace the stored rows for a date range with freshly fetched pages of rows, writing each page as it
+# comes in. It all happens in one transaction, so readers keep seeing the old rows until every page is in.
+def store_range(conn, property_id, report_table, pages, start, end, now=None):
+    now = now or datetime.now()
+    start_key, end_key = start.strftime(GA4_DATE_FORMAT), end.strftime(GA4_DATE_FORMAT)
+
+    with conn:
+        table_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (report_table,)
+        ).fetchone()
+        if table_exists:
+            conn.execute(
+                f'DELETE FROM "{report_table}" WHERE property_id = ? AND "Date" BETWEEN ? AND ?',
+                (str(property_id), start_key, end_key),
+            )
+
+        # Days without any rows are still recorded as synced below
+        for df in pages:
+            if not df.empty:
+                rows = df.assign(property_id=str(property_id))
+                rows.to_sql(report_table, conn, if_exists="append", index=False)
+
+        # Synced to the microsecond, so every sync gives the slices over these days a new version
+        synced_at = now.isoformat()
+        conn.executemany(
+            "INSERT OR REPLACE INTO synced_days (property_id, report_table, day, synced_at) VALUES (?, ?, ?, ?)",
+            [(str(property_id), report_table, day.strftime(GA4_DATE_FORMAT), synced_at)
+             for day in pd.date_range(start, end).date],
+        )
+
+
+# Load the stored rows for a date range, without the property_id bookkeeping column
+def load_range(conn, property_id, report_table, columns, start, end):
+    table_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (report_table,)
+    ).fetchone()
+    if not table_exists:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.read_sql_query(
+        f'SELECT * FROM "{report_table}" WHERE property_id = ? AND "Date" BETWEEN ? AND ?',
+        conn,
+        params=(str(property_id), start.strftime(GA4_DATE_FORMAT), end.strftime(GA4_DATE_FORMAT)),
+    )
+    return df.reindex(columns=columns)
+
+
+# Snapshot a date range of a report table as a WarehouseSlice; path is the warehouse file it lives in
+def slice_range(conn, path, property_id, report_table, columns, start, end):
+    version = conn.execute(
+        "SELECT COUNT(*), MAX(synced_at) FROM synced_days WHERE property_id = ? AND report_table = ? AND day BETWEEN ? AND ?",
+        (str(property_id), report_table, start.strftime(GA4_DATE_FORMAT), end.strftime(GA4_DATE_FORMAT)),
+    ).fetchone()
+    return WarehouseSlice(path, str(property_id), report_table, tuple(columns), start, end, tuple(version))
+
+
+# Read a slice's rows back in chunks of at most chunksize rows, so callers can fold them without holding the range in memory
+def iter_slice(warehouse_slice, chunksize=100000):
+    conn = connect(warehouse_slice.path)
+    try:
+        table_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (warehouse_slice.report_table,)
+        ).fetchone()
+        if not table_exists:
+            return
+
+        chunks = pd.read_sql_query(
+            f'SELECT * FROM "{warehouse_slice.report_table}" WHERE property_id = ? AND "Date" BETWEEN ? AND ?',
+            conn,
+            params=(warehouse_slice.property_id, warehouse_slice.start.strftime(GA4_DATE_FORMAT), warehouse_slice.end.strftime(GA4_DATE_FORMAT)),
+            chunksize=chunksize,
+        )
+        for chunk in chunks:
+            yield chunk.reindex(columns=list(warehouse_slice.columns))
+    finally:
+        conn.close()
+
+
+# Load a slice's rows as one frame
+def load_slice(warehouse_slice):
+    conn = connect(warehouse_slice.path)
+    try:
+        return load_range(conn, warehouse_slice.property_id, warehouse_slice.report_table,
+                          list(warehouse_slice.columns), warehouse_slice.start, warehouse_slice.end)
+    finally:
+        conn.close()
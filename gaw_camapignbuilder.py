@@ -3,6 +3,7 @@ from llm_integration import query_gpt_keywordbuilder, initialize_llm_context
 import json
 import re
 import pandas as pd
+from gaw_data_pull import fetch_keyword_metrics
 
 # Set page configuration
 st.set_page_config(page_title="Keyword Campaign Builder", layout="wide")
@@ -109,6 +110,18 @@ def main():
             st.session_state["keywords_df"]["Keyword"].isin(refined_keywords)
         ]
 
+        # Enrich the keyword list with search volumes and bids from Google Ads, all keywords in one lookup
+        with st.expander("Search Volumes and Bids"):
+            customer_id = st.text_input("Google Ads customer ID", value=st.secrets["google_ads"].get("customer_id", ""))
+            if st.button("Fetch Search Volumes") and customer_id.strip():
+                with st.spinner("Fetching keyword metrics..."):
+                    st.session_state["keyword_metrics"] = fetch_keyword_metrics(
+                        customer_id.strip().replace("-", ""), st.session_state["keywords_df"]["Keyword"].tolist()
+                    )
+
+        if "keyword_metrics" in st.session_state:
+            refined_df = refined_df.merge(st.session_state["keyword_metrics"].drop_duplicates("Keyword"), on="Keyword", how="left")
+
         # Display the refined DataFrame with a title
         st.subheader("Your Keyword List")
         st.dataframe(refined_df, use_container_width=True)
@@ -1,59 +1,242 @@
 
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from google.ads.googleads.client import GoogleAdsClient
-from google.ads.googleads.errors import GoogleAdsException
 import streamlit as st
+import clients
+from instrumentation import timed, with_current_run
 
-def fetch_keyword_data(customer_id, location_ids, language_id, page_url):
-    # Load credentials from Streamlit secrets
-    credentials_dict = {
-        "developer_token": st.secrets["google_ads"]["developer_token"],
-        "client_id": st.secrets["google_ads"]["client_id"],
-        "client_secret": st.secrets["google_ads"]["client_secret"],
-        "refresh_token": st.secrets["google_ads"]["refresh_token"],
-        "login_customer_id": None,  # Optional for test accounts
-        "use_proto_plus": True
+# Google Ads API version used for every request
+API_VERSION = "v18"
+
+# Location and language constants used when none are given (New York, NY and English)
+DEFAULT_LOCATION_IDS = ["1014044"]
+DEFAULT_LANGUAGE_ID = "1000"
+
+# Keyword ideas and metrics are reused for a day; the oldest entries go once the cache is full
+KEYWORD_CACHE_TTL = 24 * 60 * 60
+KEYWORD_CACHE_MAX_ENTRIES = 50000
+
+# Keywords per historical metrics request (the API accepts up to 10,000); smaller batches run in parallel
+HISTORICAL_METRICS_BATCH_SIZE = 1000
+
+# Keyword planning requests are throttled per developer token: at most this many in flight,
+# started no closer together than MIN_REQUEST_INTERVAL seconds, retried when the quota is hit
+MAX_WORKERS = 4
+MIN_REQUEST_INTERVAL = 1.0
+MAX_RETRIES = 3
+
+IDEA_COLUMNS = [
+    "Keyword",
+    "Avg Monthly Searches",
+    "Competition",
+    "Low Top of Page Bid (micros)",
+    "High Top of Page Bid (micros)",
+]
+
+# (seed type, seed, locations, language) -> (stored at, idea rows), and
+# ("metrics", keyword, locations, language) -> (stored at, metrics row)
+idea_cache = {}
+idea_cache_lock = threading.Lock()
+
+# Start time of the next request allowed by the rate limit
+next_request_at = 0.0
+rate_limit_lock = threading.Lock()
+
+
+def cache_get(key):
+    with idea_cache_lock:
+        entry = idea_cache.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > KEYWORD_CACHE_TTL:
+            del idea_cache[key]
+            return None
+        return entry[1]
+
+
+def cache_put(key, rows):
+    with idea_cache_lock:
+        idea_cache[key] = (time.time(), rows)
+        # Dicts keep insertion order, so the first keys are the oldest
+        while len(idea_cache) > KEYWORD_CACHE_MAX_ENTRIES:
+            del idea_cache[next(iter(idea_cache))]
+
+
+# Block until the rate limit allows another request
+def wait_for_request_slot():
+    global next_request_at
+    with rate_limit_lock:
+        now = time.monotonic()
+        start_at = max(now, next_request_at)
+        next_request_at = start_at + MIN_REQUEST_INTERVAL
+    time.sleep(max(start_at - now, 0))
+
+
+def is_quota_error(ex):
+    return ex.error.code().name == "RESOURCE_EXHAUSTED"
+
+
+# Send a Google Ads request under the rate limit, backing off and retrying when the quota is exhausted
+def call_with_rate_limit(func, *args, **kwargs):
+    from google.ads.googleads.errors import GoogleAdsException
+
+    for attempt in range(MAX_RETRIES + 1):
+        wait_for_request_slot()
+        try:
+            return func(*args, **kwargs)
+        except GoogleAdsException as ex:
+            if attempt == MAX_RETRIES or not is_quota_error(ex):
+                raise
+            time.sleep(2 ** attempt + random.random())
+
+
+# Normalized locations and language, used in requests and cache keys
+def targeting(location_ids, language_id):
+    location_ids = sorted(str(location_id) for location_id in (location_ids or DEFAULT_LOCATION_IDS))
+    return location_ids, str(language_id or DEFAULT_LANGUAGE_ID)
+
+
+def metrics_row(keyword, metrics):
+    return {
+        "Keyword": keyword,
+        "Avg Monthly Searches": metrics.avg_monthly_searches,
+        "Competition": metrics.competition.name,
+        "Low Top of Page Bid (micros)": metrics.low_top_of_page_bid_micros,
+        "High Top of Page Bid (micros)": metrics.high_top_of_page_bid_micros
     }
-    
-    # Location and language constants (New York, NY and English as defaults)
-    location_ids = ["1014044"]
-    language_id = "1000"  # English
-
-    # Website URL for generating keyword ideas
-    try:
-        client = GoogleAdsClient.load_from_dict(credentials_dict, version="v18")
-
-        # KeywordPlanIdeaService
-        keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
-
-        # Create request
-        request = client.get_type("GenerateKeywordIdeasRequest")
-        request.customer_id = customer_id
-        request.language = client.get_service("GoogleAdsService").language_constant_path(language_id)
-        request.geo_target_constants.extend([
-            client.get_service("GeoTargetConstantService").geo_target_constant_path(location_id)
-            for location_id in location_ids
-        ])
-        request.url_seed.url = page_url
-
-        # Fetch keyword ideas
-        response = keyword_plan_idea_service.generate_keyword_ideas(request=request)
-
-        # Collect data
-        data = []
-        for idea in response:
-            metrics = idea.keyword_idea_metrics
-            data.append({
-                "Keyword": idea.text,
-                "Avg Monthly Searches": metrics.avg_monthly_searches,
-                "Competition": metrics.competition.name,
-                "Low Top of Page Bid (micros)": metrics.low_top_of_page_bid_micros,
-                "High Top of Page Bid (micros)": metrics.high_top_of_page_bid_micros
-            })
-
-        # Convert to DataFrame
-        return pd.DataFrame(data)
-
-    except GoogleAdsException as ex:
-        st.error(f"GoogleAdsException occurred: {ex}")
-        return pd.DataFrame()  # Return an empty DataFrame on failure
+
+
+# Keyword ideas for one URL or keyword seed, as a list of row dicts
+def fetch_seed_ideas(customer_id, seed_type, seed, location_ids, language_id):
+    key = (seed_type, seed, tuple(location_ids), language_id)
+    rows = cache_get(key)
+    if rows is not None:
+        return rows
+
+    client = clients.ads_client(API_VERSION)
+
+    # KeywordPlanIdeaService
+    keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
+
+    # Create request
+    request = client.get_type("GenerateKeywordIdeasRequest")
+    request.customer_id = customer_id
+    request.language = client.get_service("GoogleAdsService").language_constant_path(language_id)
+    request.geo_target_constants.extend([
+        client.get_service("GeoTargetConstantService").geo_target_constant_path(location_id)
+        for location_id in location_ids
+    ])
+    if seed_type == "url":
+        request.url_seed.url = seed
+    else:
+        request.keyword_seed.keywords.append(seed)
+
+    def collect():
+        # Iterating the response pulls every page of ideas
+        rows = []
+        for idea in keyword_plan_idea_service.generate_keyword_ideas(request=request):
+            rows.append(metrics_row(idea.text, idea.keyword_idea_metrics))
+        return rows
+
+    rows = call_with_rate_limit(collect)
+    cache_put(key, rows)
+    return rows
+
+
+# Keyword ideas for many seed URLs and keywords at once, fetched concurrently and
+# deduplicated into one frame; the Seeds column lists every seed that suggested a keyword
+@timed("ads.fetch_keyword_ideas")
+def fetch_keyword_ideas(customer_id, urls=(), keywords=(), location_ids=None, language_id=None, max_workers=MAX_WORKERS):
+    from google.ads.googleads.errors import GoogleAdsException
+
+    location_ids, language_id = targeting(location_ids, language_id)
+    seeds = list(dict.fromkeys([("url", url) for url in urls] + [("keyword", keyword) for keyword in keywords]))
+
+    frames = []
+    if seeds:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(seeds))) as executor:
+            futures = [
+                (seed, executor.submit(with_current_run(fetch_seed_ideas), customer_id, seed_type, seed, location_ids, language_id))
+                for seed_type, seed in seeds
+            ]
+            for seed, future in futures:
+                try:
+                    frames.append(pd.DataFrame(future.result(), columns=IDEA_COLUMNS).assign(Seeds=seed))
+                except GoogleAdsException as ex:
+                    # One failing seed doesn't lose the ideas from the others
+                    st.error(f"GoogleAdsException occurred for {seed}: {ex}")
+
+    if not frames:
+        return pd.DataFrame(columns=IDEA_COLUMNS + ["Seeds"])
+
+    ideas = pd.concat(frames, ignore_index=True)
+    seeds_by_keyword = ideas.groupby("Keyword", sort=False)["Seeds"].agg(lambda seeds: ", ".join(dict.fromkeys(seeds)))
+    ideas = ideas.drop_duplicates("Keyword").drop(columns="Seeds")
+    return ideas.merge(seeds_by_keyword, on="Keyword").reset_index(drop=True)
+
+
+# Keyword ideas for a single page URL
+def fetch_keyword_data(customer_id, location_ids, language_id, page_url):
+    ideas = fetch_keyword_ideas(customer_id, urls=[page_url], location_ids=location_ids, language_id=language_id)
+    return ideas.drop(columns="Seeds")
+
+
+# Historical metrics for one batch of keywords, cached per keyword (lowercased)
+def fetch_metrics_batch(customer_id, keywords, location_ids, language_id):
+    client = clients.ads_client(API_VERSION)
+    keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
+
+    request = client.get_type("GenerateKeywordHistoricalMetricsRequest")
+    request.customer_id = customer_id
+    request.keywords.extend(keywords)
+    request.language = client.get_service("GoogleAdsService").language_constant_path(language_id)
+    request.geo_target_constants.extend([
+        client.get_service("GeoTargetConstantService").geo_target_constant_path(location_id)
+        for location_id in location_ids
+    ])
+
+    response = call_with_rate_limit(keyword_plan_idea_service.generate_keyword_historical_metrics, request=request)
+
+    # The API merges close variants into one result; each variant gets that result's metrics
+    found = {}
+    for result in response.results:
+        for text in [result.text, *result.close_variants]:
+            found[text.lower()] = metrics_row(text, result.keyword_metrics)
+
+    for keyword in keywords:
+        # Keywords without data are cached too (as an empty row) so they aren't asked for again
+        cache_put(("metrics", keyword, tuple(location_ids), language_id), found.get(keyword, {}))
+
+
+# Search volume, competition and top of page bids for many keywords, one row per keyword in the
+# order given. Keywords already cached are not requested; the rest go out in parallel batches.
+@timed("ads.fetch_keyword_metrics")
+def fetch_keyword_metrics(customer_id, keywords, location_ids=None, language_id=None,
+                          batch_size=HISTORICAL_METRICS_BATCH_SIZE, max_workers=MAX_WORKERS):
+    from google.ads.googleads.errors import GoogleAdsException
+
+    location_ids, language_id = targeting(location_ids, language_id)
+    normalized = {keyword: keyword.strip().lower() for keyword in keywords}
+
+    def cache_key(keyword):
+        return ("metrics", keyword, tuple(location_ids), language_id)
+
+    missing = [keyword for keyword in dict.fromkeys(normalized.values()) if cache_get(cache_key(keyword)) is None]
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            futures = [executor.submit(with_current_run(fetch_metrics_batch), customer_id, batch, location_ids, language_id) for batch in batches]
+            for future in futures:
+                try:
+                    future.result()
+                except GoogleAdsException as ex:
+                    st.error(f"GoogleAdsException occurred: {ex}")
+
+    rows = []
+    for keyword, key in normalized.items():
+        rows.append({**(cache_get(cache_key(key)) or {}), "Keyword": keyword})
+    return pd.DataFrame(rows, columns=IDEA_COLUMNS)
@@ -1,23 +1,43 @@
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
-from google.oauth2 import service_account
-import streamlit as st
+import clients
+import tenants
+from instrumentation import span, timed, with_current_run
 
 # Define the Google Search Console property URL
 PROPERTY_URL = "https://sterlingmentalperformance.com/"  # Replace with your actual website URL in Search Console
 
-# Load the service account credentials from Streamlit secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["google_service_account"],
-    scopes=['https://www.googleapis.com/auth/webmasters.readonly']
-)
+# The Search Analytics API returns at most 25,000 rows per request
+GSC_PAGE_SIZE = 25000
 
-# Initialize the Google Search Console service
-service = build('searchconsole', 'v1', credentials=credentials)
+# Dimensions pulled by the full export, and the column name each one gets
+EXPORT_DIMENSIONS = ['query', 'page', 'date', 'device']
+DIMENSION_COLUMNS = {
+    'query': 'Search Query',
+    'page': 'Page',
+    'date': 'Date',
+    'device': 'Device',
+    'country': 'Country',
+}
+METRIC_COLUMNS = ['Impressions', 'Clicks', 'CTR', 'Avg. Position']
+
+# Where the full export is written when no path is given
+EXPORT_PATH = os.path.join(".cache", "search_console_export.sqlite")
+
+# Search Console service, site URL and credentials for a tenant, or the app's own site by default
+def search_console_target(tenant=None):
+    if tenant is None:
+        return clients.search_console_service(), PROPERTY_URL, clients.search_console_credentials()
+    return tenants.search_console_service(tenant), tenant.site_url, tenants.search_console_credentials(tenant)
 
 # Define a function to fetch Google Search Console data
-def fetch_search_console_data(start_date=None, end_date=None):
+@timed("gsc.fetch_search_console_data")
+def fetch_search_console_data(start_date=None, end_date=None, tenant=None):
     # Default to last 30 days if no date range is provided
     if not start_date:
         end_date = datetime.today()
@@ -37,7 +57,8 @@ def fetch_search_console_data(start_date=None, end_date=None):
     }
     
     # Run the query
-    response = service.searchanalytics().query(siteUrl=PROPERTY_URL, body=request).execute()
+    target_service, site_url, _ = search_console_target(tenant)
+    response = target_service.searchanalytics().query(siteUrl=site_url, body=request).execute()
     
     # Parse response into a list of rows
     rows = []
@@ -55,6 +76,7 @@ def fetch_search_console_data(start_date=None, end_date=None):
 
 
 # Function to create a summary of the top 30 search queries for LLM consumption
+@timed("gsc.summarize_search_queries")
 def summarize_search_queries(search_data):
     # Ensure necessary columns are present
     if not all(col in search_data.columns for col in ["Search Query", "Impressions", "Clicks", "Avg. Position"]):
@@ -78,3 +100,134 @@ def summarize_search_queries(search_data):
         summary += f"{query} | {impressions} | {clicks} | {avg_position},\n"
     
     return summary
+
+
+# Turn a page of Search Analytics rows into a DataFrame
+def rows_to_frame(rows, dimensions):
+    columns = {DIMENSION_COLUMNS.get(dimension, dimension): [row['keys'][i] for row in rows]
+               for i, dimension in enumerate(dimensions)}
+    columns['Impressions'] = [row.get('impressions', 0) for row in rows]
+    columns['Clicks'] = [row.get('clicks', 0) for row in rows]
+    columns['CTR'] = [row.get('ctr', 0) for row in rows]
+    columns['Avg. Position'] = [row.get('position', 0) for row in rows]
+    return pd.DataFrame(columns)
+
+
+# Yield every row for the date range one page at a time using startRow paging
+def iter_search_console_pages(start_date, end_date, dimensions=EXPORT_DIMENSIONS, row_limit=GSC_PAGE_SIZE, http=None, tenant=None):
+    target_service, site_url, _ = search_console_target(tenant)
+    start_row = 0
+    while True:
+        request = {
+            'startDate': start_date,
+            'endDate': end_date,
+            'dimensions': dimensions,
+            'searchType': 'web',
+            'rowLimit': row_limit,
+            'startRow': start_row,
+        }
+        with span("gsc.query") as details:
+            response = target_service.searchanalytics().query(siteUrl=site_url, body=request).execute(http=http)
+            details["rows"] = len(response.get('rows', []))
+        rows = response.get('rows', [])
+        if not rows:
+            break
+
+        yield rows_to_frame(rows, dimensions)
+
+        # A short page means we've reached the end
+        if len(rows) < row_limit:
+            break
+        start_row += len(rows)
+
+
+# Split a date range into roughly equal contiguous slices
+def date_slices(start_date, end_date, slices):
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    days = (end - start).days + 1
+    slices = max(1, min(slices, days))
+    step = -(-days // slices)
+
+    ranges = []
+    slice_start = start
+    while slice_start <= end:
+        slice_end = min(slice_start + timedelta(days=step - 1), end)
+        ranges.append((slice_start.strftime('%Y-%m-%d'), slice_end.strftime('%Y-%m-%d')))
+        slice_start = slice_end + timedelta(days=1)
+    return ranges
+
+
+# Export every row for the dimensions into an on-disk SQLite table, a page at a time
+@timed("gsc.export_search_console_data")
+def export_search_console_data(start_date, end_date, dimensions=EXPORT_DIMENSIONS, path=None,
+                               table="search_console", parallel_slices=1, progress=None, tenant=None):
+    from google_auth_httplib2 import AuthorizedHttp
+
+    path = path or (tenants.cache_path(tenant, "search_console_export.sqlite") if tenant else EXPORT_PATH)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Slices fetch in parallel but pages queue up for a single writer; the bounded queue keeps memory flat
+    pages = queue.Queue(maxsize=parallel_slices * 2)
+    done = object()
+    stop = threading.Event()
+
+    def fetch_slice(slice_start, slice_end):
+        # httplib2 is not thread-safe, so each slice gets its own authorized connection
+        http = AuthorizedHttp(search_console_target(tenant)[2]) if parallel_slices > 1 else None
+        try:
+            for page in iter_search_console_pages(slice_start, slice_end, dimensions, http=http, tenant=tenant):
+                if stop.is_set():
+                    break
+                pages.put(page)
+        finally:
+            pages.put(done)
+
+    slices = date_slices(start_date, end_date, parallel_slices)
+    conn = sqlite3.connect(path, timeout=30)
+    total_rows = 0
+    try:
+        with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+            futures = [executor.submit(with_current_run(fetch_slice), slice_start, slice_end) for slice_start, slice_end in slices]
+
+            with conn:
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+            finished = 0
+            try:
+                while finished < len(slices):
+                    page = pages.get()
+                    if page is done:
+                        finished += 1
+                        continue
+
+                    with conn:
+                        page.to_sql(table, conn, if_exists="append", index=False)
+                    total_rows += len(page)
+                    if progress:
+                        progress(total_rows)
+            except Exception:
+                # Stop the slices and drain the queue so none of them stay blocked on a full queue
+                stop.set()
+                while finished < len(slices):
+                    if pages.get() is done:
+                        finished += 1
+                raise
+
+            # Surface any API error raised inside a slice
+            for future in futures:
+                future.result()
+    finally:
+        conn.close()
+
+    return total_rows
+
+
+# Read an exported table back in chunks so large exports never have to fit in memory
+def read_search_console_export(path=None, table="search_console", chunksize=GSC_PAGE_SIZE):
+    conn = sqlite3.connect(path or EXPORT_PATH)
+    try:
+        yield from pd.read_sql_query(f'SELECT * FROM "{table}"', conn, chunksize=chunksize)
+    finally:
+        conn.close()
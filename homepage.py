@@ -1,10 +1,12 @@
-import openai
 import streamlit as st
 import pandas as pd
 from datetime import date, timedelta
 from ga4_data_pull import *
 from gsc_data_pull import *
 from llm_integration import *
+from dashboard_pipeline import build_report, insight_questions, load_artifacts, report_dir
+from data_acquisition import acquire_dashboard_data
+from instrumentation import start_run, render_debug_panel
 from urllib.parse import quote
 
 # Page configuration
@@ -14,7 +16,7 @@ st.set_page_config(page_title="BizBuddy", layout="wide", page_icon = "🤓")
 st.markdown("<h1 style='text-align: center;'>Welcome to BizBuddy: Let's Grow Your Digital Presence</h1>", unsafe_allow_html=True)
 st.markdown("<h2 style='text-align: center;'>Sterling Mental Performance</h2>", unsafe_allow_html=True)
 
-def generate_seo_insights(search_data):
+def seo_insights_prompt(search_data):
    # Prepare the search query list
    query_list = search_data["Search Query"].unique()
    formatted_queries = "\n".join(query_list)
@@ -28,9 +30,11 @@ def generate_seo_insights(search_data):
    "- New niche ideas for search terms that could improve conversions.\n"
    "- A brief explanation of why SEO optimization is critical for this business."
    )
+   return prompt
 
+def generate_seo_insights(search_data):
    # Call the LLM using query_gpt
-   response = query_gpt(prompt)
+   response = query_gpt(seo_insights_prompt(search_data))
    return response
    
 # Initialize LLM context with business context on app load
@@ -46,21 +50,90 @@ def display_report_with_llm(summary_func, llm_prompt):
    return llm_response
 
 
+# Date ranges offered by the dashboard picker: label -> days back from today, None for a custom range
+DATE_WINDOWS = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90, "Custom Range": None}
+DEFAULT_DATE_WINDOW = "Last 30 Days"
+
+
+# Pick the reporting window in the sidebar, returning its label and (start, end) dates.
+# Preset windows end yesterday, like the GA4 "30daysAgo" to "yesterday" range.
+def select_date_window():
+    yesterday = date.today() - timedelta(days=1)
+    labels = list(DATE_WINDOWS)
+    label = st.sidebar.selectbox("Date range", labels, index=labels.index(DEFAULT_DATE_WINDOW))
+
+    days = DATE_WINDOWS[label]
+    if days is not None:
+        return label, (date.today() - timedelta(days=days), yesterday)
+
+    picked = st.sidebar.date_input("Custom range", value=(yesterday - timedelta(days=29), yesterday), max_value=yesterday)
+    # Until the second date is picked, show the single chosen day
+    start, end = (picked[0], picked[-1]) if picked else (yesterday, yesterday)
+    return f"{start:%b %d, %Y} - {end:%b %d, %Y}", (start, end)
+
+
+# The days the dashboard keeps synced: every preset window and the period before it, plus the picked
+# window (and its previous period, with compare), so the daily rollups already hold whatever the picker
+# offers and moving between windows never goes back to GA4 for days already fetched
+def dashboard_range(date_window, compare=False):
+    yesterday = date.today() - timedelta(days=1)
+    longest = max(days for days in DATE_WINDOWS.values() if days)
+    start = previous_window((date.today() - timedelta(days=longest), yesterday))[0]
+    start = min(start, previous_window(date_window)[0] if compare else date_window[0])
+    return start, max(date_window[1], yesterday)
+
+
+# Fetch the dashboard's sources for the date window in parallel: the GA4 reports are synced into the
+# warehouse over dashboard_range (unless the precomputed report is used), which only asks GA4 for days it
+# does not hold yet (and, with refresh, for the days GA4 may still revise), alongside the window's Search
+# Console queries. A slow or failing source doesn't hold up or take down the others.
+def acquire_live_data(date_window, compare=False, refresh=False, ga4=True):
+    sync_start, sync_end = dashboard_range(date_window, compare)
+    loading = st.empty()
+    results = acquire_dashboard_data(
+        date_window[0].isoformat(), date_window[1].isoformat(),
+        ga4=ga4, sync_dates=(sync_start.isoformat(), sync_end.isoformat()), refresh=refresh,
+        progress=streamlit_progress("Syncing GA4 reports", loading), search_console=True,
+    )
+    loading.empty()
+    return results
+
+
+# Build the dashboard for the date window from the synced GA4 reports, optionally compared with the
+# period before it. The stages are memoized in the session, so a rerun only recomputes what its window
+# or newly synced days changed.
+def load_live_report(date_window, ga4_result, compare=False):
+    if ga4_result.error is not None:
+        st.error(f"Could not load GA4 data: {ga4_result.error}")
+        st.stop()
+
+    memo = st.session_state.setdefault("report_stage_memo", {})
+    return build_report(ga4_result.data, date_window, compare=compare, memo=memo)
+
+
 def main():
-    # Fetch data for the last 30 days (from 30 days ago to yesterday)
-    start_date_30_days = "30daysAgo"
-    end_date_yesterday = "yesterday"
+    # Every rerun gets its own set of stage timings
+    start_run()
 
-    df_30_days = fetch_metrics_by_source(start_date_30_days, end_date_yesterday)
-    
-    # Fetch data for the last month (from 60 days ago to 30 days ago)
-    start_date_60_days = "60daysAgo"
-    end_date_30_days = "31daysAgo"
+    # Report on the last 30 days (from 30 days ago to yesterday) unless another range is picked
+    period_label, date_window = select_date_window()
+
+    # Compare the headline metrics with the period of the same length before the window
+    compare = st.sidebar.checkbox("Compare with previous period", value=True)
 
-    # Fetch event data (generate leads)
-    event_data = fetch_metrics_by_event(start_date_30_days, end_date_yesterday)  # Add this line to fetch event data
+    # Use the nightly precomputed report (which carries the comparison) when there is a fresh one for
+    # the default window, otherwise build it live
+    refresh_live = st.sidebar.checkbox("Refresh with live data")
+    use_precomputed = not refresh_live and compare and period_label == DEFAULT_DATE_WINDOW
+    precomputed = load_artifacts(report_dir(), date_window) if use_precomputed else None
+    results = acquire_live_data(date_window, compare, refresh=refresh_live, ga4=not precomputed)
 
-    lp_df_30_days = fetch_metrics_by_landing_page(start_date_30_days, end_date_yesterday)
+    if precomputed:
+        report, insights, manifest = precomputed
+        st.sidebar.caption(f"Report generated {manifest['generated_at']}")
+    else:
+        report = load_live_report(date_window, results["ga4"], compare)
+        insights = {}
    
     # First column - GA4 Metrics and Insights
     col1, col2 = st.columns(2)
@@ -69,32 +142,22 @@ def main():
         st.markdown("<h3 style='text-align: center;'>Web Performance Overview</h3>", unsafe_allow_html=True)
         
         # Summarize monthly data with leads now included (for the 30 days data)
-        current_summary = summarize_monthly_data(df_30_days, event_data)[0]
+        current_summary = report["current_summary"]
        
         # Display GA4 metrics (Updated with the new leads data)
-        generate_all_metrics_copy(current_summary)
-        
-        # LLM insights based on GA data
-        ga_llm_prompt = """
-           Based on the following website performance metrics, provide a short analysis. Highlight key improvements, areas needing attention, 
-           and how these metrics compare to typical industry standards. Limit your response to 2-3 bullet points.
-           """
-        
-        # Combine current summary into a string for LLM processing
-        metric_summary_text = "\n".join([f"{row['Metric']}: {row['Value']}" for _, row in current_summary.iterrows()])
-        ga_insights = query_gpt(ga_llm_prompt, metric_summary_text)
+        generate_all_metrics_copy(current_summary, period_label)
         
         st.markdown("### Insights from AI")
-        st.markdown(ga_insights)
+        ga_insights_placeholder = st.empty()
 
     # Second column - Acquisition Overview (with Pie Chart and Source Descriptions)
     with col2:
         st.markdown("<h3 style='text-align: center;'>Acquisition Overview</h3>", unsafe_allow_html=True)
         acq_col1, acq_col2 = st.columns(2)
     with acq_col1:
-        plot_acquisition_pie_chart_plotly(summarize_monthly_data(df_30_days, event_data)[1])
+        plot_acquisition_pie_chart_plotly(report["acquisition_pie_chart"])
     with acq_col2:
-        describe_top_sources(summarize_monthly_data(df_30_days, event_data)[1])
+        describe_top_sources(report["top_sources"])
         
         temp_url = "https://bizbuddyv1-ppcbuddy.streamlit.app/"
         st.markdown("Search and social ads are key to driving traffic. Check out these tools to help you get going.")
@@ -108,31 +171,44 @@ def main():
         st.markdown("<h3 style='text-align: center;'>Individual Page Overview</h3>", unsafe_allow_html=True)
     
         # Get landing page summary (now includes leads)
-        landing_page_summary = summarize_landing_pages(lp_df_30_days, event_data)
+        landing_page_summary = report["landing_page_summary"]
         generate_page_summary(landing_page_summary)
         
-        llm_input = st.session_state.get("page_summary_llm", "")
-        response = query_gpt("Provide insights based on the following page performance data, note that there is no CTAs on any page besides the Home. We need to think of ways to drive more people to the contact page. State only the bullets, no pre text. Limit your response to 2-3 bullet points:", llm_input)
-        
         st.markdown("### Insights from AI")
-        st.markdown(response)
+        page_insights_placeholder = st.empty()
     
     with col4:
         st.markdown("<h3 style='text-align: center;'>Search Query Analysis</h3>", unsafe_allow_html=True)
         sq_col1, sq_col2 = st.columns(2)
     with sq_col1:
         st.markdown("These are all the search terms that your website has shown up for in the search results. The Google search engine shows websites based on the relevance of a website's information as it relates to the search terms.")
-        #search_data = fetch_search_console_data()
-        #st.dataframe(search_data['Search Query'], use_container_width=True)
+        search_result = results["search_console"]
+        if search_result.error is not None:
+            st.warning(f"Search Console data is unavailable right now: {search_result.error}")
+        else:
+            st.dataframe(search_result.data['Search Query'], use_container_width=True)
         
     with sq_col2:
-        #seo_insights = generate_seo_insights(search_data)
-        #st.markdown(seo_insights)
-        #encoded_message = quote(str(seo_insights))
-        #seo_url = f"https://bizbuddyv1-seobuddy.streamlit.app?message={encoded_message}"
+        #seo_insights_placeholder = st.empty()
         seo_url = f"https://smp-bizbuddyv1-seobuddy.streamlit.app/"
         st.link_button("Check Out our SEO Helper!!", seo_url)
 
+    placeholders = {"ga_insights": ga_insights_placeholder, "page_insights": page_insights_placeholder}
+
+    # Precomputed insights are shown as they are
+    if insights:
+        for name, placeholder in placeholders.items():
+            placeholder.markdown(insights.get(name, ""))
+        render_debug_panel()
+        return
+
+    # With the page laid out, ask all insight questions at once and stream each answer into its section
+    questions = insight_questions(report)
+    insight_jobs = [(placeholders[name], *questions[name]) for name in placeholders]
+    #insight_jobs.append((seo_insights_placeholder, seo_insights_prompt(search_data), ""))
+    stream_insights(insight_jobs)
+    render_debug_panel()
+
 # Execute the main function only when the script is run directly
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import inspect
+import functools
+import contextvars
+import itertools
+import threading
+from collections import namedtuple, deque, OrderedDict
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
+
+# One timed piece of work: wall time, rows produced and change in resident memory (bytes).
+# Memory is measured for the whole process, so spans running in parallel see each other's allocations.
+Span = namedtuple("Span", ["run_id", "name", "started_at", "seconds", "rows", "memory_delta", "thread", "error"])
+
+# Most recent spans kept in memory across reruns
+MAX_SPANS = 5000
+spans = deque(maxlen=MAX_SPANS)
+spans_lock = threading.Lock()
+
+# Per-stage totals over the life of the process, which only ever grow (unlike the bounded span
+# deque), so they can be exported as Prometheus counters: stage name -> {"count", "seconds", "rows",
+# "errors", "memory"}
+stage_totals = OrderedDict()
+
+# When set, every finished span is also appended to this file as a JSON line
+TRACE_PATH = os.environ.get("BIZBUDDY_TRACE_PATH")
+
+# Spans are tagged with the dashboard run they belong to. The run id lives in a context variable,
+# so concurrent Streamlit sessions each see their own run; worker threads start with an empty
+# context and get their caller's run through with_current_run.
+run_counter = itertools.count(1)
+current_run = contextvars.ContextVar("bizbuddy_run_id", default=None)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Start a new run (one Streamlit rerun or one CLI invocation) and return its id
+def start_run():
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{next(run_counter)}"
+    current_run.set(run_id)
+    return run_id
+
+
+# Wrap a function handed to a worker thread so its spans belong to the caller's run
+def with_current_run(func):
+    run_id = current_run.get()
+
+    @functools.wraps(func)
+    def in_run(*args, **kwargs):
+        token = current_run.set(run_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current_run.reset(token)
+    return in_run
+
+
+# Resident set size of the process in bytes, or None where /proc is not available
+def resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Rows in a result: frames and series by length, lists by item count, tuples/dicts of frames summed
+def count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple) and value and all(isinstance(item, pd.DataFrame) for item in value):
+        return sum(len(item) for item in value)
+    if isinstance(value, dict) and value and all(isinstance(item, pd.DataFrame) for item in value.values()):
+        return sum(len(item) for item in value.values())
+    if isinstance(value, list):
+        return len(value)
+    return None
+
+
+# Add a span to per-stage totals
+def add_to_totals(totals_by_stage, span_record):
+    totals = totals_by_stage.setdefault(span_record.name, {"count": 0, "seconds": 0.0, "rows": 0, "errors": 0, "memory": 0})
+    totals["count"] += 1
+    totals["seconds"] += span_record.seconds
+    totals["rows"] += span_record.rows or 0
+    totals["errors"] += span_record.error is not None
+    totals["memory"] += span_record.memory_delta or 0
+
+
+def record(span_record):
+    with spans_lock:
+        spans.append(span_record)
+        add_to_totals(stage_totals, span_record)
+        if TRACE_PATH:
+            with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(span_record._asdict()) + "\n")
+
+
+# Time a block of work; set details["rows"] inside the block to record how many rows it handled
+@contextmanager
+def span(name):
+    details = {"rows": None}
+    error = None
+    started_at = time.time()
+    memory_before = resident_memory()
+    started = time.perf_counter()
+    try:
+        yield details
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        memory_after = resident_memory()
+        memory_delta = memory_after - memory_before if memory_before is not None and memory_after is not None else None
+        record(Span(current_run.get(), name, started_at, seconds, details["rows"], memory_delta,
+                    threading.current_thread().name, error))
+
+
+# Decorator recording a span around every call; generators are timed until they are exhausted
+# and count the rows of everything they yield
+def timed(name=None):
+    def decorate(func):
+        span_name = name or func.__name__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with span(span_name) as details:
+                    details["rows"] = 0
+                    for item in func(*args, **kwargs):
+                        rows = count_rows(item)
+                        details["rows"] += 1 if rows is None else rows
+                        yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as details:
+                result = func(*args, **kwargs)
+                details["rows"] = count_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def run_spans(run_id=None):
+    with spans_lock:
+        return [s for s in spans if run_id is None or s.run_id == run_id]
+
+
+def json_lines(records=None):
+    records = run_spans() if records is None else records
+    return "".join(json.dumps(s._asdict()) + "\n" for s in records)
+
+
+# Prometheus text exposition aggregated per stage: the process-lifetime totals by default, or the given spans
+def prometheus_text(records=None):
+    if records is None:
+        with spans_lock:
+            stages = OrderedDict((name, dict(totals)) for name, totals in stage_totals.items())
+    else:
+        stages = OrderedDict()
+        for s in records:
+            add_to_totals(stages, s)
+
+    metrics = [
+        ("bizbuddy_stage_seconds", "summary", "Wall time spent in each dashboard stage.", None),
+        ("bizbuddy_stage_rows_total", "counter", "Rows produced by each dashboard stage.", "rows"),
+        ("bizbuddy_stage_errors_total", "counter", "Calls of each dashboard stage that raised.", "errors"),
+        ("bizbuddy_stage_memory_delta_bytes", "gauge", "Summed change in resident memory across each dashboard stage.", "memory"),
+    ]
+
+    lines = []
+    for metric, metric_type, description, field in metrics:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for stage_name, totals in stages.items():
+            label = '{stage="%s"}' % stage_name.replace("\\", "\\\\").replace('"', '\\"')
+            if field is None:
+                lines.append(f"{metric}_sum{label} {totals['seconds']:.6f}")
+                lines.append(f"{metric}_count{label} {totals['count']}")
+            else:
+                lines.append(f"{metric}{label} {totals[field]}")
+    return "\n".join(lines) + "\n"
+
+
+# Sidebar table of this run's spans with Prometheus and JSON lines downloads
+def render_debug_panel():
+    if not st.sidebar.checkbox("Show stage timings"):
+        return
+
+    records = run_spans(current_run.get())
+    if not records:
+        st.sidebar.caption("No stages timed in this run.")
+        return
+
+    table = pd.DataFrame([s._asdict() for s in records])
+    table["memory_delta"] = table["memory_delta"] / 1e6
+    table = table.rename(columns={"name": "Stage", "seconds": "Seconds", "rows": "Rows", "memory_delta": "Memory Δ (MB)"})
+    st.sidebar.dataframe(table[["Stage", "Seconds", "Rows", "Memory Δ (MB)"]].round(3), use_container_width=True)
+    st.sidebar.caption(f"Total {table['Seconds'].sum():.2f}s across {len(table)} stages (stages can overlap).")
+
+    st.sidebar.download_button("Download Prometheus metrics", prometheus_text(), file_name="bizbuddy_metrics.prom")
+    st.sidebar.download_button("Download spans (JSON lines)", json_lines(records), file_name="bizbuddy_spans.jsonl")
@@ -0,0 +1,127 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+# Location of the on-disk LLM response cache
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite"))
+
+# Responses older than this are treated as stale (seconds)
+TTL_SECONDS = 24 * 60 * 60
+
+# Least recently used responses are evicted beyond these limits
+MAX_ENTRIES = 1000
+MAX_BYTES = 50 * 1024 * 1024
+
+
+# Open a connection to the cache and make sure its tables exist
+def connect(path=None):
+    path = path or CACHE_PATH
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, response TEXT, size INTEGER, created_at REAL, last_accessed REAL)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+    return conn
+
+
+# Cache key for a completion: the model, system message and full prompt together
+def cache_key(model, system_message, prompt):
+    digest = hashlib.sha256()
+    for part in (model, system_message, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Bump one of the persistent hit/miss counters
+def increment_counter(conn, name):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+# Look up a cached response, returning None on a miss or when the entry has expired
+def get(key, path=None):
+    now = time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > TTL_SECONDS:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                increment_counter(conn, "misses")
+                return None
+
+            conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            increment_counter(conn, "hits")
+            return row[0]
+    finally:
+        conn.close()
+
+
+# Store a response and evict expired and least recently used entries past the size limits
+def put(key, response, path=None):
+    now = time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            evict(conn, now)
+    finally:
+        conn.close()
+
+
+# Remove expired entries, then the least recently used ones until the cache fits its limits
+def evict(conn, now=None):
+    now = now or time.time()
+
+    # Drop everything past its TTL
+    expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - TTL_SECONDS,)).rowcount
+
+    # Keep only the most recently used entries that fit in both the entry and byte budgets
+    over_limit = conn.execute(
+        "DELETE FROM responses WHERE key IN ("
+        "SELECT key FROM (SELECT key, "
+        "ROW_NUMBER() OVER (ORDER BY last_accessed DESC) AS position, "
+        "SUM(size) OVER (ORDER BY last_accessed DESC ROWS UNBOUNDED PRECEDING) AS running_bytes "
+        "FROM responses) WHERE position > ? OR running_bytes > ?)",
+        (MAX_ENTRIES, MAX_BYTES),
+    ).rowcount
+
+    if expired + over_limit:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES ('evictions', ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (expired + over_limit,),
+        )
+
+
+# Hit/miss/eviction counters plus the current size of the cache
+def stats(path=None):
+    conn = connect(path)
+    try:
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    finally:
+        conn.close()
+
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "evictions": counters.get("evictions", 0),
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "entries": entries,
+        "bytes": size,
+    }
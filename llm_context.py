@@ -0,0 +1,118 @@
+from collections import Counter
+from nltk.tokenize import wordpunct_tokenize, PunktSentenceTokenizer
+
+# Ceiling on the business context plus conversation history sent with every question (tokens)
+CONTEXT_TOKEN_BUDGET = 2000
+
+# Newest turns are kept word for word, older ones are folded into the running summary
+RECENT_TURNS = 2
+
+# Size the running summary of older turns is compressed to (tokens)
+SUMMARY_TOKEN_BUDGET = 400
+
+# Used when the nltk stopwords corpus has not been downloaded
+FALLBACK_STOPWORDS = {
+    "a", "about", "after", "all", "also", "an", "and", "any", "are", "as", "at", "be", "been", "but", "by",
+    "can", "could", "do", "for", "from", "has", "have", "how", "i", "if", "in", "into", "is", "it", "its",
+    "may", "more", "most", "no", "not", "of", "on", "or", "our", "she", "so", "such", "than", "that", "the",
+    "their", "them", "there", "these", "they", "this", "to", "was", "we", "were", "what", "when", "which",
+    "while", "who", "will", "with", "would", "you", "your",
+}
+
+try:
+    from nltk.corpus import stopwords
+    STOPWORDS = set(stopwords.words("english"))
+except LookupError:
+    STOPWORDS = FALLBACK_STOPWORDS
+
+sentence_tokenizer = PunktSentenceTokenizer()
+
+
+# Approximate token count: words and punctuation runs, close to what the model is billed for
+def count_tokens(text):
+    return len(wordpunct_tokenize(text))
+
+
+# Extractive summary: keep the highest scoring sentences that fit in max_tokens, in their original order
+def summarize_extractive(text, max_tokens=SUMMARY_TOKEN_BUDGET):
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sentences = [
+        sentence
+        for line in text.splitlines() if line.strip()
+        for sentence in sentence_tokenizer.tokenize(line)
+    ]
+
+    # Score each sentence by how frequent its content words are across the whole text
+    words = [word.lower() for word in wordpunct_tokenize(text) if word.isalnum() and word.lower() not in STOPWORDS]
+    frequencies = Counter(words)
+    top_frequency = max(frequencies.values(), default=1)
+
+    scores = []
+    for position, sentence in enumerate(sentences):
+        sentence_words = [word.lower() for word in wordpunct_tokenize(sentence) if word.isalnum()]
+        score = sum(frequencies.get(word, 0) for word in sentence_words) / top_frequency
+        scores.append((score / max(len(sentence_words), 1) ** 0.5, position))
+
+    chosen = []
+    used = 0
+    for _, position in sorted(scores, reverse=True):
+        size = count_tokens(sentences[position])
+        if used + size <= max_tokens:
+            chosen.append(position)
+            used += size
+
+    return " ".join(sentences[position] for position in sorted(chosen))
+
+
+def render_turns(turns):
+    return "\n".join(f"User: {prompt}\nModel: {answer}" for prompt, answer in turns)
+
+
+# The context prefix sent with each question: business context, summary of older turns, recent turns
+def render_context(state):
+    parts = [state.get("llm_context", "")]
+    if state.get("llm_history_summary"):
+        parts.append("Summary of earlier questions and answers:\n" + state["llm_history_summary"])
+    if state.get("llm_turns"):
+        parts.append(render_turns(state["llm_turns"]))
+    return "\n".join(parts)
+
+
+# Fold older turns into the summary until the rendered context fits the budget
+def compact_context(state, budget=CONTEXT_TOKEN_BUDGET):
+    # First fold everything but the most recent turns, then the recent turns too
+    for keep in (RECENT_TURNS, 0):
+        if count_tokens(render_context(state)) <= budget:
+            return
+
+        turns = state.get("llm_turns", [])
+        if len(turns) > keep:
+            older = turns[:len(turns) - keep]
+            state["llm_history_summary"] = summarize_extractive(
+                "\n".join(filter(None, [state.get("llm_history_summary", ""), render_turns(older)])),
+                SUMMARY_TOKEN_BUDGET,
+            )
+            state["llm_turns"] = turns[len(turns) - keep:]
+
+    # Finally squeeze the summary into whatever room the business context leaves
+    overflow = count_tokens(render_context(state)) - budget
+    if overflow > 0 and state.get("llm_history_summary"):
+        room = max(count_tokens(state["llm_history_summary"]) - overflow, 0)
+        state["llm_history_summary"] = summarize_extractive(state["llm_history_summary"], room)
+
+
+# Start a fresh conversation on top of the given business context
+def reset_context(state, context=""):
+    state["llm_context"] = context
+    state["llm_turns"] = []
+    state["llm_history_summary"] = ""
+    state["session_summary"] = render_context(state)
+
+
+# Record a question and its answer, compacting the history to stay within the budget
+def add_turn(state, prompt, answer, budget=CONTEXT_TOKEN_BUDGET):
+    state["llm_turns"] = state.get("llm_turns", []) + [(prompt, answer)]
+    compact_context(state, budget)
+    state["session_summary"] = render_context(state)
@@ -1,8 +1,12 @@
-from openai import OpenAI
+import queue
+import threading
 import streamlit as st
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=st.secrets["openai"]["api_key"])
+import clients
+import llm_cache
+import llm_context
+import llm_queue
+import call_queue
+from instrumentation import timed, with_current_run
 
 # Business context for session memory
 business_context = """
@@ -12,51 +16,186 @@ Keep a few key things in mind, she is in lynnwood Washing just outside Seattle.
 for her is someone going to the contact page and filling out a contact form (a lead). Keep in mind this data is from this year summarized for that whole time period.
 """
 
+# Model and system message shared by every query
+MODEL = "gpt-4o-mini"
+SYSTEM_MESSAGE = "You are a data analyst with a focus on digital growth and conversion optimization."
+
+# Shown instead of an answer when OpenAI still rate limits or fails after every retry
+BUSY_MESSAGE = "The AI assistant is busy right now. Please try again in a minute."
+
 def initialize_llm_context():
-    if "session_summary" not in st.session_state:
-        st.session_state["session_summary"] = business_context
+    if "llm_context" not in st.session_state:
+        llm_context.reset_context(st.session_state, business_context)
 
-def query_gpt(prompt, data_summary=""):
-    try:
-        session_summary = st.session_state.get("session_summary", "")
-        full_prompt = f"{session_summary}\n\nData Summary:\n{data_summary}\n\nUser Question: {prompt}"
+# Drop the conversation history and start over from the given context
+def reset_llm_context(context=""):
+    llm_context.reset_context(st.session_state, context)
 
-        # Send the prompt to GPT-4 through the OpenAI client instance
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+# Complete a prompt, serving byte-for-byte repeats from the disk cache; returns the answer and its cache key
+@timed("llm.completion")
+def cached_completion(full_prompt, model=MODEL, system_message=SYSTEM_MESSAGE, priority=call_queue.INTERACTIVE):
+    key = llm_cache.cache_key(model, system_message, full_prompt)
+    answer = llm_cache.get(key)
+    if answer is not None:
+        return answer, key
+
+    # Send the prompt to GPT-4 through the OpenAI client instance, queued behind the rate limits
+    response = llm_queue.dispatch(
+        lambda: clients.openai_client().chat.completions.create(
+            model=model,
             messages=[
-                {"role": "system", "content": "You are a data analyst with a focus on digital growth and conversion optimization."},
+                {"role": "system", "content": system_message},
                 {"role": "user", "content": full_prompt}
             ]
-        )
-        
-        # Access the response using dot notation
-        answer = response.choices[0].message.content
-        st.session_state["session_summary"] += f"\nUser: {prompt}\nModel: {answer}\n"
+        ),
+        llm_context.count_tokens(system_message) + llm_context.count_tokens(full_prompt),
+        priority,
+    )
+
+    # Access the response using dot notation
+    answer = response.choices[0].message.content
+    llm_cache.put(key, answer)
+
+    return answer, key
+
+# Stream a completion token by token; cached answers arrive in one piece
+@timed("llm.stream_completion")
+def stream_completion(full_prompt, model=MODEL, system_message=SYSTEM_MESSAGE, priority=call_queue.INTERACTIVE):
+    key = llm_cache.cache_key(model, system_message, full_prompt)
+    answer = llm_cache.get(key)
+    if answer is not None:
+        yield answer
+        return
+
+    stream = llm_queue.dispatch_stream(
+        lambda: clients.openai_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": full_prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True}
+        ),
+        llm_context.count_tokens(system_message) + llm_context.count_tokens(full_prompt),
+        priority,
+    )
+
+    parts = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+
+    llm_cache.put(key, "".join(parts))
+
+# What to show in place of an answer that failed
+def error_message(e):
+    if llm_queue.is_retryable(e):
+        return BUSY_MESSAGE
+    return f"Error: {e}"
+
+def build_full_prompt(session_summary, prompt, data_summary):
+    return f"{session_summary}\n\nData Summary:\n{data_summary}\n\nUser Question: {prompt}"
+
+# A question already answered this session is served from the cache without growing the history,
+# so reruns keep sending the same prompts
+def answered_before(prompt, data_summary):
+    asked = st.session_state.setdefault("llm_asked", {})
+    question_key = llm_cache.cache_key(MODEL, SYSTEM_MESSAGE, f"{data_summary}\n\n{prompt}")
+    if question_key in asked:
+        return llm_cache.get(asked[question_key])
+    return None
+
+# Add an answered question to the session history, compacting older turns to stay within the token budget
+def record_answer(prompt, data_summary, full_prompt, answer):
+    asked = st.session_state.setdefault("llm_asked", {})
+    question_key = llm_cache.cache_key(MODEL, SYSTEM_MESSAGE, f"{data_summary}\n\n{prompt}")
+    asked[question_key] = llm_cache.cache_key(MODEL, SYSTEM_MESSAGE, full_prompt)
+    llm_context.add_turn(st.session_state, prompt, answer)
+
+@timed("llm.query_gpt")
+def query_gpt(prompt, data_summary=""):
+    try:
+        answer = answered_before(prompt, data_summary)
+        if answer is not None:
+            return answer
+
+        full_prompt = build_full_prompt(st.session_state.get("session_summary", ""), prompt, data_summary)
+
+        answer, _ = cached_completion(full_prompt)
+        record_answer(prompt, data_summary, full_prompt, answer)
         
         return answer
 
     except Exception as e:
-        return f"Error: {e}"
+        return error_message(e)
+
+# Ask several questions at once, streaming each answer into its own Streamlit placeholder
+def stream_insights(jobs):
+    # jobs is a list of (placeholder, prompt, data_summary); every question sees the same history
+    session_summary = st.session_state.get("session_summary", "")
+    answers = [None] * len(jobs)
+    full_prompts = {}
+
+    for i, (placeholder, prompt, data_summary) in enumerate(jobs):
+        answer = answered_before(prompt, data_summary)
+        if answer is not None:
+            answers[i] = answer
+            placeholder.markdown(answer)
+        else:
+            full_prompts[i] = build_full_prompt(session_summary, prompt, data_summary)
+
+    # Workers only produce tokens, all rendering stays on the script thread
+    tokens = queue.Queue()
 
+    def worker(i, full_prompt):
+        try:
+            for token in stream_completion(full_prompt):
+                tokens.put((i, token, None))
+            tokens.put((i, None, None))
+        except Exception as e:
+            tokens.put((i, None, e))
 
+    for i, full_prompt in full_prompts.items():
+        threading.Thread(target=with_current_run(worker), args=(i, full_prompt), daemon=True).start()
+
+    texts = {i: "" for i in full_prompts}
+    failed = set()
+    remaining = len(full_prompts)
+    while remaining:
+        i, token, error = tokens.get()
+        placeholder = jobs[i][0]
+        if error is not None:
+            texts[i] = error_message(error)
+            failed.add(i)
+            remaining -= 1
+            placeholder.markdown(texts[i])
+        elif token is None:
+            remaining -= 1
+            placeholder.markdown(texts[i])
+        else:
+            texts[i] += token
+            placeholder.markdown(texts[i] + "▌")
+
+    # Record the new answers in question order once everything has arrived
+    for i in sorted(full_prompts):
+        answers[i] = texts[i]
+        if i not in failed:
+            _, prompt, data_summary = jobs[i]
+            record_answer(prompt, data_summary, full_prompts[i], texts[i])
+
+    return answers
+
+
+@timed("llm.query_gpt_keywordbuilder")
 def query_gpt_keywordbuilder(prompt, data_summary=""):
     try:
         full_prompt = f"\n\nData Summary:\n{data_summary}\n\nUser Question: {prompt}"
     
-        # Send the prompt to GPT-4 through the OpenAI client instance
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a data analyst with a focus on digital growth and conversion optimization."},
-                {"role": "user", "content": full_prompt}
-            ]
-        )
-        
-        # Access the response using dot notation
-        answer = response.choices[0].message.content
+        answer, _ = cached_completion(full_prompt)
         
         return answer
 
     except Exception as e:
-        return f"Error: {e}"
+        return error_message(e)
@@ -0,0 +1,176 @@
+import os
+import time
+import call_queue
+from instrumentation import span
+
+# Every OpenAI completion goes through here. Calls queue and start in priority order (dashboard
+# questions before background jobs), no more than MAX_CONCURRENT_COMPLETIONS at a time, once a
+# token bucket refilled at the account's requests- and tokens-per-minute limits can cover them.
+# Rate limit and transient server errors are retried with jittered exponential backoff.
+# Priorities, queueing and backoff come from call_queue.
+
+# The organization's per-model limits (see the OpenAI limits page); keep them a little under the real ones
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 450))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 180000))
+
+# Completions running at once; streamed answers hold their slot until the last token. OpenAI limits
+# requests and tokens per minute, not connections, so this only keeps a burst from opening too many.
+MAX_CONCURRENT_COMPLETIONS = int(os.environ.get("LLM_MAX_CONCURRENT_COMPLETIONS", 32))
+
+# Tokens reserved for the answer before it is known; corrected from the response's usage afterwards
+EXPECTED_OUTPUT_TOKENS = 800
+
+# Longest wait taken from a retry-after header; the server's hint can be well past BACKOFF_CAP when a
+# minute's requests are used up
+MAX_RETRY_AFTER = 120.0
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Requests and tokens that may still be spent, refilled continuously up to one minute's worth.
+# Tokens can go negative when an answer ran longer than expected; later calls wait it out.
+bucket = {"requests": float(REQUESTS_PER_MINUTE), "tokens": float(TOKENS_PER_MINUTE), "updated_at": time.monotonic(),
+          "in_flight": 0, "paused_until": 0.0}
+
+# Queued calls; a call starts when it is first in line
+queue = call_queue.new_queue()
+
+
+def refill(now):
+    elapsed = now - bucket["updated_at"]
+    bucket["requests"] = min(float(REQUESTS_PER_MINUTE), bucket["requests"] + elapsed * REQUESTS_PER_MINUTE / 60)
+    bucket["tokens"] = min(float(TOKENS_PER_MINUTE), bucket["tokens"] + elapsed * TOKENS_PER_MINUTE / 60)
+    bucket["updated_at"] = now
+
+
+# How long a call needing the given tokens must still wait, or 0 when it may start now
+def admission_delay(tokens, now):
+    if bucket["in_flight"] >= MAX_CONCURRENT_COMPLETIONS:
+        return 1.0
+    # A prompt larger than a minute's tokens only waits for a full bucket
+    tokens = min(tokens, TOKENS_PER_MINUTE)
+    return max(
+        bucket["paused_until"] - now,
+        (1 - bucket["requests"]) * 60 / REQUESTS_PER_MINUTE,
+        (tokens - bucket["tokens"]) * 60 / TOKENS_PER_MINUTE,
+        0.0,
+    )
+
+
+# Block until the call may start, then take a slot and its share of the buckets
+def acquire(tokens, priority):
+    def delay():
+        now = time.monotonic()
+        refill(now)
+        return admission_delay(tokens, now)
+
+    with queue["condition"]:
+        call_queue.wait_turn(queue, priority, delay)
+
+        bucket["in_flight"] += 1
+        bucket["requests"] -= 1
+        bucket["tokens"] -= tokens
+        queue["condition"].notify_all()
+
+
+# Give the slot back, charging the tokens actually used instead of the estimate
+def release(estimated_tokens, used_tokens=None, pause=0.0):
+    with queue["condition"]:
+        bucket["in_flight"] -= 1
+        if used_tokens is not None:
+            bucket["tokens"] -= used_tokens - estimated_tokens
+
+        # After a rate limit or server error every queued call backs off, not just this one
+        if pause:
+            bucket["paused_until"] = max(bucket["paused_until"], time.monotonic() + pause)
+
+        queue["condition"].notify_all()
+
+
+def is_retryable(ex):
+    import openai
+    # Running out of credit is reported as a 429 too, but waiting won't fix it
+    if getattr(ex, "code", None) == "insufficient_quota":
+        return False
+    if isinstance(ex, openai.APIConnectionError):
+        return True
+    return isinstance(ex, openai.APIStatusError) and ex.status_code in RETRY_STATUSES
+
+
+# Jittered exponential backoff, or as long as the server said to wait (up to MAX_RETRY_AFTER)
+def backoff_delay(attempt, ex=None):
+    delay = call_queue.backoff_delay(attempt)
+    response = getattr(ex, "response", None)
+    if response is not None:
+        try:
+            if "retry-after-ms" in response.headers:
+                delay = max(delay, float(response.headers["retry-after-ms"]) / 1000)
+            elif "retry-after" in response.headers:
+                delay = max(delay, float(response.headers["retry-after"]))
+        except ValueError:
+            pass
+    return min(delay, MAX_RETRY_AFTER)
+
+
+def used_tokens(usage):
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+# Run a completion call (a function taking no arguments) through the queue and return its response.
+# estimated_tokens is the prompt's size; the expected answer length is added here.
+def dispatch(call, estimated_tokens, priority=call_queue.INTERACTIVE):
+    tokens = estimated_tokens + EXPECTED_OUTPUT_TOKENS
+
+    for attempt in range(call_queue.MAX_RETRIES + 1):
+        with span("llm.queue_wait"):
+            acquire(tokens, priority)
+
+        used, pause = None, 0.0
+        try:
+            response = call()
+            used = used_tokens(getattr(response, "usage", None))
+            return response
+        except Exception as ex:
+            if attempt == call_queue.MAX_RETRIES or not is_retryable(ex):
+                raise
+            pause = backoff_delay(attempt, ex)
+        finally:
+            release(tokens, used, pause)
+
+
+# Stream a completion call through the queue, yielding its chunks. The slot is held until the
+# stream ends; a failure is retried only before the first chunk, after that it is raised.
+def dispatch_stream(call, estimated_tokens, priority=call_queue.INTERACTIVE):
+    tokens = estimated_tokens + EXPECTED_OUTPUT_TOKENS
+
+    for attempt in range(call_queue.MAX_RETRIES + 1):
+        with span("llm.queue_wait"):
+            acquire(tokens, priority)
+
+        used, pause, started = None, 0.0, False
+        try:
+            for chunk in call():
+                started = True
+                # With stream_options include_usage the last chunk carries the usage
+                used = used_tokens(getattr(chunk, "usage", None)) or used
+                yield chunk
+            return
+        except Exception as ex:
+            if started or attempt == call_queue.MAX_RETRIES or not is_retryable(ex):
+                raise
+            pause = backoff_delay(attempt, ex)
+        finally:
+            release(tokens, used, pause)
+
+
+# Current bucket levels and queue length, for display and logging
+def queue_status():
+    with queue["condition"]:
+        refill(time.monotonic())
+        return {
+            "in_flight": bucket["in_flight"],
+            "queued": call_queue.queued(queue),
+            "requests_available": bucket["requests"],
+            "tokens_available": bucket["tokens"],
+            "paused_for": max(bucket["paused_until"] - time.monotonic(), 0.0),
+        }
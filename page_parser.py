@@ -0,0 +1,124 @@
+from html.parser import HTMLParser
+
+# Tags whose text makes up the page copy
+COPY_TAGS = {"p", "h1", "h2", "h3"}
+
+# Tags that never have children or an end tag (the same list BeautifulSoup uses)
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+}
+
+# Text inside these tags is not part of get_text() in BeautifulSoup, so it is skipped here too
+HIDDEN_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
+
+# Single pass over the HTML collecting only what the SEO helper needs: the first title,
+# the first description/keywords meta tags, copy tag text and link targets. No tree is built;
+# an open-tag stack mirrors how BeautifulSoup's html.parser builder nests and closes tags.
+class PageCopyParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.title = None
+        self.title_nodes = None
+        self.meta = {}
+        self.copy = []
+        self.open_copy = []
+        self.links = []
+        self.hidden_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            name = attrs.get("name")
+            if name in ("description", "keywords") and name not in self.meta:
+                self.meta[name] = attrs.get("content", "")
+        elif tag == "a" and "href" in attrs:
+            self.links.append(attrs["href"])
+
+        if tag in VOID_TAGS:
+            return
+
+        # Inside the title, keep the element structure so its .string can be worked out
+        if self.title_nodes is not None:
+            self.title_nodes[-1].append([])
+            self.title_nodes.append(self.title_nodes[-1][-1])
+        elif tag == "title" and self.title is None:
+            self.title_nodes = [[]]
+        if tag in COPY_TAGS:
+            self.copy.append([])
+            self.open_copy.append(self.copy[-1])
+        if tag in HIDDEN_TEXT_TAGS:
+            self.hidden_depth += 1
+        self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Like BeautifulSoup, an end tag closes every element opened after its start tag;
+        # end tags with nothing to close are ignored
+        if tag not in self.stack:
+            return
+        while self.stack:
+            closed = self.stack.pop()
+            if closed in COPY_TAGS:
+                self.open_copy.pop()
+            if closed in HIDDEN_TEXT_TAGS:
+                self.hidden_depth -= 1
+            if self.title_nodes is not None:
+                node = self.title_nodes.pop()
+                if not self.title_nodes:
+                    self.title = node_string(node)
+                    self.title_nodes = None
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        if self.title_nodes is not None:
+            self.title_nodes[-1].append(data)
+        if self.hidden_depth or not self.open_copy:
+            return
+
+        text = data.strip()
+        if text:
+            for parts in self.open_copy:
+                parts.append(text)
+
+    def handle_comment(self, data):
+        if self.title_nodes is not None:
+            self.title_nodes[-1].append(None)
+
+    def close(self):
+        super().close()
+        # An unclosed title still counts
+        if self.title_nodes is not None:
+            self.handle_endtag("title")
+
+
+# BeautifulSoup's .string: the text of an element whose only child is a string,
+# or recursively an element with a single child; otherwise empty
+def node_string(node):
+    if len(node) != 1 or node[0] is None:
+        return ""
+    return node[0] if isinstance(node[0], str) else node_string(node[0])
+
+
+# Title, meta tags and copy in the structure the SEO helper displays, plus the raw link targets
+def parse_page_copy(html):
+    parser = PageCopyParser()
+    parser.feed(html)
+    parser.close()
+
+    page_text = "\n\n".join("".join(parts) for parts in parser.copy)
+    seo_data = {
+        "Title": parser.title or "No title found",
+        "Meta Description": parser.meta.get("description") or "No meta description found",
+        "Meta Keywords": parser.meta.get("keywords") or "No meta keywords found",
+        "Page Copy": page_text if page_text else "No main content found on this page.",
+    }
+    return seo_data, parser.links
@@ -0,0 +1,88 @@
+# Precompute the dashboard offline so the Streamlit app only has to load finished results
+#
+# Run on a schedule (e.g. nightly cron) from the repo root:
+#   python precompute_reports.py                     # the app's own site
+#   python precompute_reports.py --tenant acme       # one or more registered tenants
+#   python precompute_reports.py --all-tenants --skip-insights
+#
+# Tenants are fetched and built in parallel worker processes (see tenant_fanout); insights and
+# artifacts are then written from this process as each tenant's report comes back.
+import argparse
+import sys
+import call_queue
+from dashboard_pipeline import fetch_and_build_report, insight_questions, write_artifacts, report_dir, REPORTS_DIR
+from llm_integration import cached_completion, build_full_prompt, business_context
+from tenants import load_tenants
+from tenant_fanout import fan_out, build_tenant_report
+from instrumentation import start_run, prometheus_text
+
+
+# Answer each insight question with a fresh context (no session history offline). Nightly insights
+# yield to questions asked on a dashboard.
+def generate_insights(report):
+    insights = {}
+    for name, (prompt, data_summary) in insight_questions(report).items():
+        answer, _ = cached_completion(build_full_prompt(business_context, prompt, data_summary),
+                                     priority=call_queue.BACKGROUND)
+        insights[name] = answer
+    return insights
+
+
+# Generate the insights for a built report and write its artifacts
+def publish(name, report, args):
+    insights = {} if args.skip_insights else generate_insights(report)
+    write_artifacts(report_dir(name, args.out), report, insights, args.start, args.end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute BizBuddy dashboard reports.")
+    parser.add_argument("--start", default="30daysAgo", help="GA4 start date (default: 30daysAgo)")
+    parser.add_argument("--end", default="yesterday", help="GA4 end date (default: yesterday)")
+    parser.add_argument("--out", default=REPORTS_DIR, help=f"output folder (default: {REPORTS_DIR})")
+    parser.add_argument("--tenant", action="append", default=[], help="tenant to precompute, repeatable")
+    parser.add_argument("--all-tenants", action="store_true", help="precompute every registered tenant")
+    parser.add_argument("--skip-insights", action="store_true", help="write summaries and charts only")
+    parser.add_argument("--metrics", help="write per-stage timings here in Prometheus text format")
+    parser.add_argument("--workers", type=int, help="worker processes for tenants (default: one per core)")
+    args = parser.parse_args()
+
+    registry = load_tenants()
+    names = list(registry) if args.all_tenants else args.tenant
+
+    start_run()
+
+    # Nightly refreshes yield their GA4 calls to anyone viewing a dashboard on the same property
+    if names:
+        results = fan_out([registry[name] for name in names], args.start, args.end, max_workers=args.workers,
+                          priority=call_queue.BACKGROUND, summarize=build_tenant_report)
+        outcomes = [(name, results[name].data, results[name].error) for name in names]
+    else:
+        try:
+            outcomes = [("default", fetch_and_build_report(args.start, args.end, priority=call_queue.BACKGROUND), None)]
+        except Exception as e:
+            outcomes = [("default", None, f"{type(e).__name__}: {e}")]
+
+    failures = 0
+    for name, report, error in outcomes:
+        if error is None:
+            try:
+                publish(name, report, args)
+                print(f"{name}: written to {report_dir(name, args.out)}")
+                continue
+            except Exception as e:
+                error = str(e)
+
+        # Keep going so one broken site doesn't block everyone else's report
+        failures += 1
+        print(f"{name}: failed: {error}", file=sys.stderr)
+
+    # e.g. a node_exporter textfile collector path, so nightly stage timings end up on a dashboard
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import hashlib
+import pandas as pd
+
+# Registered report stages: name -> (function, names of the stages/sources it reads)
+STAGES = {}
+
+
+# Register a function as a report stage computed from the named inputs
+def stage(name, inputs=()):
+    def register(func):
+        STAGES[name] = (func, tuple(inputs))
+        return func
+    return register
+
+
+# Stable fingerprint of a source value, hashing DataFrames by content
+def fingerprint(value):
+    digest = hashlib.sha1()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode("utf-8"))
+        digest.update(repr(list(value.dtypes.astype(str))).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            digest.update(fingerprint(item).encode("utf-8"))
+    else:
+        digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Evaluate the requested stages from the given sources, reusing memoized results
+def evaluate_stages(names, sources, memo=None):
+    # Keep the latest result per stage; pass a dict that outlives the call to reuse results across calls
+    memo = {} if memo is None else memo
+
+    # Sources are hashed once, derived stages are keyed by the keys of their inputs
+    keys = {name: fingerprint(value) for name, value in sources.items()}
+    values = dict(sources)
+
+    def resolve(name):
+        if name in values:
+            return values[name]
+
+        func, inputs = STAGES[name]
+        input_values = [resolve(input_name) for input_name in inputs]
+
+        key = hashlib.sha1(repr((name, [keys[input_name] for input_name in inputs])).encode("utf-8")).hexdigest()
+        keys[name] = key
+
+        cached = memo.get(name)
+        if cached is not None and cached[0] == key:
+            values[name] = cached[1]
+        else:
+            values[name] = func(*input_values)
+            memo[name] = (key, values[name])
+
+        return values[name]
+
+    return {name: resolve(name) for name in names}
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+# One dimension's daily totals with prefix sums along the date axis.
+# Rows are sorted by (group, day) and keyed by group code * n_days + day offset, so the days of one
+# group inside any date window are a contiguous run found with two binary searches, and its window
+# totals are the difference of two prefix rows.
+DailyRollup = namedtuple("DailyRollup", ["dimension", "groups", "first_day", "n_days", "keys", "prefix", "columns", "integer_columns"])
+
+# Row count carried alongside the metric sums, so means can be rebuilt for any window
+ROWS_COLUMN = "Rows"
+
+
+# Collapse a report frame to one row per (group, day) and take prefix sums of the given columns.
+# Frames that are already daily totals pass the column holding each row's count of source rows as
+# row_counts, and the columns to round back to integers as integer_columns.
+def build_rollup(df, dimension, columns, row_counts=None, integer_columns=None):
+    dates = pd.to_datetime(df['Date'], errors='coerce')
+    codes, groups = pd.factorize(df[dimension], sort=True)
+
+    # Rows without a date or a dimension value can't be placed in the cube
+    valid = dates.notna().to_numpy() & (codes >= 0)
+    if integer_columns is None:
+        integer_columns = [col for col in columns if pd.api.types.is_integer_dtype(df[col])]
+
+    if not valid.any():
+        return DailyRollup(dimension, groups, None, 0, np.empty(0, dtype=np.int64),
+                           np.zeros((1, len(columns) + 1)), columns, integer_columns)
+
+    dates = dates[valid]
+    first_day = dates.min().normalize()
+    days = ((dates - first_day) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+    n_days = int(days.max()) + 1
+    keys = codes[valid].astype(np.int64) * n_days + days
+
+    # Missing metric values count as zero but still count as rows, as in the summaries
+    rows = np.ones(len(keys)) if row_counts is None else df[row_counts].to_numpy(dtype=np.float64)[valid]
+    values = np.column_stack(
+        [pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)[valid] for col in columns]
+        + [rows]
+    )
+
+    order = np.argsort(keys, kind="stable")
+    keys, starts = np.unique(keys[order], return_index=True)
+    daily = np.add.reduceat(values[order], starts, axis=0)
+
+    # prefix[i] holds the totals of the first i daily rows
+    prefix = np.vstack([np.zeros((1, daily.shape[1])), np.cumsum(daily, axis=0)])
+
+    return DailyRollup(dimension, groups, first_day, n_days, keys, prefix, columns, integer_columns)
+
+
+# One page's totals per (group, day), with the number of rows behind each
+def daily_totals(page, dimension, columns):
+    daily = pd.DataFrame({
+        dimension: page[dimension].astype(object),
+        "Date": pd.to_datetime(page['Date'], errors='coerce').dt.normalize(),
+    })
+    for col in columns:
+        daily[col] = pd.to_numeric(page[col], errors='coerce').fillna(0.0).astype(np.float64)
+    daily[ROWS_COLUMN] = 1.0
+
+    # Rows without a date or a dimension value are dropped by the grouping, as in build_rollup
+    return daily.groupby([dimension, "Date"], sort=False).sum()
+
+
+# Build a rollup from pages of report rows as they arrive, keeping only the running daily totals in
+# memory rather than the rows themselves. Columns that were integers on every page stay integers.
+def build_rollup_from_pages(pages, dimension, columns):
+    totals = None
+    integer_columns = list(columns)
+    for page in pages:
+        integer_columns = [col for col in integer_columns if pd.api.types.is_integer_dtype(page[col])]
+        partial = daily_totals(page, dimension, columns)
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        totals = pd.DataFrame(columns=[dimension, "Date"] + columns + [ROWS_COLUMN])
+    else:
+        totals = totals.reset_index()
+
+    return build_rollup(totals, dimension, columns, row_counts=ROWS_COLUMN, integer_columns=integer_columns)
+
+
+# Totals per group for the days from start to end (inclusive), skipping groups with no rows in the window.
+# Pass groups to look up only those dimension values.
+def window_totals(rollup, start, end, groups=None):
+    columns = [rollup.dimension] + rollup.columns + [ROWS_COLUMN]
+    if rollup.first_day is None:
+        return pd.DataFrame(columns=columns)
+
+    # Clamp the window to the days the rollup covers so offsets never spill into a neighbouring group
+    start_offset = max((pd.Timestamp(start) - rollup.first_day).days, 0)
+    end_offset = min((pd.Timestamp(end) - rollup.first_day).days, rollup.n_days - 1)
+    if start_offset > end_offset:
+        return pd.DataFrame(columns=columns)
+
+    if groups is None:
+        codes = np.arange(len(rollup.groups), dtype=np.int64)
+    else:
+        codes = rollup.groups.get_indexer(list(groups)).astype(np.int64)
+        codes = codes[codes >= 0]
+
+    base = codes * rollup.n_days
+    lo = np.searchsorted(rollup.keys, base + start_offset, side="left")
+    hi = np.searchsorted(rollup.keys, base + end_offset, side="right")
+
+    observed = hi > lo
+    codes, totals = codes[observed], rollup.prefix[hi[observed]] - rollup.prefix[lo[observed]]
+
+    frame = pd.DataFrame(totals, columns=rollup.columns + [ROWS_COLUMN])
+    for col in rollup.integer_columns + [ROWS_COLUMN]:
+        frame[col] = np.rint(frame[col]).astype(np.int64)
+    frame.insert(0, rollup.dimension, rollup.groups.take(codes))
+
+    return frame
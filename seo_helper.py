@@ -1,11 +1,10 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import json
-import gsc_data_pull
-from llm_integration import query_gpt
+from llm_integration import query_gpt, reset_llm_context
 from gaw_camapignbuilder import *
+from site_crawler import crawl_site, parse_page, shared_session, REQUEST_TIMEOUT, MAX_PAGES
 
 # Page configuration
 st.set_page_config(page_title="SEOhelper", layout="wide", page_icon = "🔎")
@@ -13,48 +12,29 @@ st.set_page_config(page_title="SEOhelper", layout="wide", page_icon = "🔎")
 # Function to fetch the page copy for SEO
 def fetch_page_copy(url):
     try:
-        # Fetch the content of the page
-        response = requests.get(url)
+        # Fetch the content of the page over the shared keep-alive session
+        response = shared_session().get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Check if request was successful
 
-        # Parse the page content
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Extract the title tag
-        title = soup.title.string if soup.title else "No title found"
-
-        # Extract the meta description
-        meta_description = ""
-        description_tag = soup.find("meta", attrs={"name": "description"})
-        if description_tag and description_tag.get("content"):
-            meta_description = description_tag["content"]
-        else:
-            meta_description = "No meta description found"
-
-        # Extract meta keywords
-        meta_keywords = ""
-        keywords_tag = soup.find("meta", attrs={"name": "keywords"})
-        if keywords_tag and keywords_tag.get("content"):
-            meta_keywords = keywords_tag["content"]
-        else:
-            meta_keywords = "No meta keywords found"
-
-        # Extract main text from <p> and heading tags
-        paragraphs = soup.find_all(['p', 'h1', 'h2', 'h3'])
-        page_text = "\n\n".join([para.get_text(strip=True) for para in paragraphs])
-
-        # Combine all extracted data into a dictionary
-        seo_data = {
-            "Title": title,
-            "Meta Description": meta_description,
-            "Meta Keywords": meta_keywords,
-            "Page Copy": page_text if page_text else "No main content found on this page."
-        }
-
+        # Parse the page content and extract the title, meta tags and main copy
+        seo_data, _ = parse_page(response.text)
         return seo_data
     except requests.RequestException as e:
         return {"Error": f"An error occurred while fetching the page: {e}"}
 
+# Crawl a whole site and return the SEO information of every page found, keyed by URL
+def crawl_site_copy(url, max_pages=MAX_PAGES):
+    progress_bar = st.progress(0.0, text="Crawling site...")
+
+    def progress(fetched, discovered):
+        progress_bar.progress(min(fetched / max(discovered, 1), 1.0), text=f"Crawled {fetched} of {discovered} pages")
+
+    # Validators from earlier crawls let unchanged pages come back as 304 Not Modified
+    cache = st.session_state.setdefault("crawl_cache", {})
+    site_data = crawl_site(url, max_pages=max_pages, cache=cache, progress=progress)
+    progress_bar.empty()
+    return site_data
+
 # Function to generate keywords based on business description
 def generate_keywords(business_description):
     llm_response = query_gpt(
@@ -103,7 +83,7 @@ def main():
          
     # Ensure session_summary is initialized in session state
     if "session_summary" not in st.session_state:
-        st.session_state["session_summary"] = ""  # Initialize with an empty string or default value
+        reset_llm_context("")  # Initialize with an empty context
     
 
     # Display SEO helper app
@@ -119,6 +99,10 @@ def main():
     # Input field for the URL to scrape
     url = st.text_input("Enter a URL to scrape", placeholder="https://example.com")
 
+    # Optionally audit the whole site: pages from the sitemap and internal links
+    crawl_mode = st.checkbox("Crawl the whole site")
+    max_pages = st.number_input("Maximum pages to crawl", min_value=1, max_value=1000, value=MAX_PAGES) if crawl_mode else 1
+
     # Initialize keyword_list variable
     keyword_list = []
 
@@ -129,7 +113,11 @@ def main():
     # Now generate the SEO analysis based on the business description and keywords
     if url and keyword_list:
         st.write("Fetching content...")
-        seo_data = fetch_page_copy(url)
+        if crawl_mode:
+            site_data = crawl_site_copy(url, max_pages)
+            seo_data = site_data.get(url) or fetch_page_copy(url)
+        else:
+            seo_data = fetch_page_copy(url)
 
         with st.expander("See Website Copy"):
             st.subheader("SEO Information")
@@ -139,6 +127,10 @@ def main():
             st.subheader("Page Copy")
             st.write(seo_data["Page Copy"])
 
+        if crawl_mode:
+            with st.expander(f"See Site Pages ({len(site_data)})"):
+                st.dataframe(pd.DataFrame.from_dict(site_data, orient="index"), use_container_width=True)
+
         # Generate the prompt for LLM analysis
         llm_prompt_final = (
             f"Here is the SEO information and page copy from a webpage:\n\n"
@@ -151,7 +143,7 @@ def main():
             f"This is an analysis from an initial look at the search query report from this website."
         )
 
-        st.session_state["session_summary"] = "" 
+        reset_llm_context("")
         
         # Display LLM analysis with the generated keywords included in the prompt
         display_report_with_llm(llm_prompt_final, keyword_list)
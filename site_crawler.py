@@ -0,0 +1,253 @@
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urldefrag, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from page_parser import parse_page_copy
+
+# (connect, read) timeout for every request, in seconds
+REQUEST_TIMEOUT = (5, 15)
+
+# Crawl limits: total pages, pages in flight, and pages in flight against any one host
+MAX_PAGES = 200
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 4
+
+# "fast" parses pages in one pass with page_parser; "soup" builds the full BeautifulSoup tree
+EXTRACTION_ENGINE = os.environ.get("SEO_EXTRACTION_ENGINE", "fast")
+
+USER_AGENT = "BizBuddy-SEOHelper/1.0 (+https://bizbuddyv1-ppcbuddy.streamlit.app/)"
+
+# Links to files that are never HTML pages
+SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip",
+    ".mp4", ".mp3", ".css", ".js", ".xml", ".json", ".doc", ".docx", ".xls", ".xlsx",
+)
+
+SITEMAP_NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# Session shared by single-page fetches across Streamlit reruns
+default_session = None
+default_session_lock = threading.Lock()
+
+# One semaphore per host caps how many requests hit the same server at once
+host_limits = {}
+host_limits_lock = threading.Lock()
+
+
+# A pooled session: keep-alive connections are reused across pages, transient errors are retried
+def build_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def shared_session():
+    global default_session
+    with default_session_lock:
+        if default_session is None:
+            default_session = build_session()
+        return default_session
+
+
+def host_limit(host, limit=PER_HOST_LIMIT):
+    with host_limits_lock:
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(limit)
+        return host_limits[host]
+
+
+# Title, meta tags and main copy of a page, in the structure the SEO helper displays
+def extract_seo_data(soup):
+    # Extract the title tag
+    title = soup.title.string if soup.title and soup.title.string else "No title found"
+
+    # Extract the meta description and keywords
+    description_tag = soup.find("meta", attrs={"name": "description"})
+    keywords_tag = soup.find("meta", attrs={"name": "keywords"})
+
+    # Extract main text from <p> and heading tags
+    paragraphs = soup.find_all(['p', 'h1', 'h2', 'h3'])
+    page_text = "\n\n".join([para.get_text(strip=True) for para in paragraphs])
+
+    return {
+        "Title": title,
+        "Meta Description": description_tag["content"] if description_tag and description_tag.get("content") else "No meta description found",
+        "Meta Keywords": keywords_tag["content"] if keywords_tag and keywords_tag.get("content") else "No meta keywords found",
+        "Page Copy": page_text if page_text else "No main content found on this page.",
+    }
+
+
+# Absolute, fragment-free URLs of the page's links that stay on the same host
+def internal_links(hrefs, page_url):
+    host = urlparse(page_url).netloc
+    links = []
+    for href in hrefs:
+        link = normalize_url(urljoin(page_url, href))
+        if link and urlparse(link).netloc == host:
+            links.append(link)
+    return links
+
+
+# SEO data and link targets of a page; falls back to BeautifulSoup if the fast parser fails
+def parse_page(html, engine=None):
+    if (engine or EXTRACTION_ENGINE) == "fast":
+        try:
+            return parse_page_copy(html)
+        except Exception:
+            pass
+
+    soup = BeautifulSoup(html, 'html.parser')
+    return extract_seo_data(soup), [anchor["href"] for anchor in soup.find_all("a", href=True)]
+
+
+# Drop fragments and anything that isn't an http(s) page
+def normalize_url(url):
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    return url
+
+
+# Fetch and parse one page; unchanged pages (304) reuse the cached result
+def fetch_page(session, url, cache=None):
+    cached = cache.get(url) if cache is not None else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        with host_limit(urlparse(url).netloc):
+            response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+        if response.status_code == 304 and cached:
+            return cached["seo_data"], cached["links"]
+
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return None, []
+
+        seo_data, hrefs = parse_page(response.text)
+        links = internal_links(hrefs, response.url)
+    except requests.RequestException as e:
+        return {"Error": f"An error occurred while fetching the page: {e}"}, []
+
+    if cache is not None and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+        cache[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "seo_data": seo_data,
+            "links": links,
+        }
+    return seo_data, links
+
+
+# Page URLs listed in a sitemap, following sitemap indexes
+def fetch_sitemap_urls(session, sitemap_url, limit=MAX_PAGES):
+    urls = []
+    pending = [sitemap_url]
+    seen = set()
+    while pending and len(urls) < limit:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+
+        try:
+            response = session.get(current, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+        except (requests.RequestException, ET.ParseError):
+            continue
+
+        for loc in root.iter(f"{SITEMAP_NAMESPACE}loc"):
+            if not loc.text:
+                continue
+            if root.tag == f"{SITEMAP_NAMESPACE}sitemapindex":
+                pending.append(loc.text.strip())
+            else:
+                urls.append(loc.text.strip())
+
+    return urls[:limit]
+
+
+# Sitemaps declared in robots.txt, falling back to /sitemap.xml
+def sitemap_locations(session, start_url):
+    root_url = urljoin(start_url, "/")
+    try:
+        response = session.get(urljoin(root_url, "/robots.txt"), timeout=REQUEST_TIMEOUT)
+        if response.ok:
+            declared = [
+                line.split(":", 1)[1].strip()
+                for line in response.text.splitlines()
+                if line.lower().startswith("sitemap:")
+            ]
+            if declared:
+                return declared
+    except requests.RequestException:
+        pass
+    return [urljoin(root_url, "/sitemap.xml")]
+
+
+# Crawl a site from its sitemap and internal links, fetching pages concurrently.
+# Returns {url: seo_data} in discovery order; pass the same cache dict between crawls
+# to revalidate pages with ETag/Last-Modified instead of downloading them again.
+def crawl_site(start_url, max_pages=MAX_PAGES, max_workers=MAX_WORKERS, use_sitemap=True,
+               follow_links=True, cache=None, session=None, progress=None):
+    session = session or build_session(max_workers)
+    host = urlparse(start_url).netloc
+
+    seeds = [start_url]
+    if use_sitemap:
+        for sitemap_url in sitemap_locations(session, start_url):
+            seeds += fetch_sitemap_urls(session, sitemap_url, max_pages)
+
+    # Discovered URLs, in the order they were found
+    frontier = deque()
+    seen = {}
+
+    def enqueue(url):
+        url = normalize_url(url)
+        if url and url not in seen and urlparse(url).netloc == host and len(seen) < max_pages:
+            seen[url] = True
+            frontier.append(url)
+
+    for url in seeds:
+        enqueue(url)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        while frontier or in_flight:
+            while frontier and len(in_flight) < max_workers:
+                url = frontier.popleft()
+                in_flight[executor.submit(fetch_page, session, url, cache)] = url
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                seo_data, links = future.result()
+                if seo_data is not None:
+                    results[url] = seo_data
+                if follow_links:
+                    for link in links:
+                        enqueue(link)
+
+            if progress:
+                progress(len(results), len(seen))
+
+    # Report pages in the order they were discovered
+    return {url: results[url] for url in seen if url in results}
@@ -0,0 +1,54 @@
+import os
+import time
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from gsc_data_pull import fetch_search_console_data, summarize_search_queries
+import call_queue
+from dashboard_pipeline import fetch_and_build_report
+
+# Outcome of one tenant's run: its summaries on success, the error message on failure
+TenantResult = namedtuple("TenantResult", ["name", "data", "error", "seconds"])
+
+# Fetch and summarize one tenant's GA4 property and, unless search_console is off, its Search Console
+# site (runs in a worker process)
+def summarize_tenant(tenant, start_date, end_date, priority=call_queue.BACKGROUND, search_console=True):
+    started = time.perf_counter()
+    try:
+        data = fetch_and_build_report(start_date, end_date, tenant=tenant, priority=priority)
+
+        if search_console and tenant.site_url:
+            data["search_query_summary"] = summarize_search_queries(fetch_search_console_data(tenant=tenant))
+
+        return TenantResult(tenant.name, data, None, time.perf_counter() - started)
+    except Exception as e:
+        # One tenant failing never takes the others down; API errors often can't be pickled, so send the message
+        return TenantResult(tenant.name, None, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+
+
+# Fetch and build one tenant's dashboard report only (runs in a worker process)
+def build_tenant_report(tenant, start_date, end_date, priority=call_queue.BACKGROUND):
+    return summarize_tenant(tenant, start_date, end_date, priority, search_console=False)
+
+
+# Summarize many tenants in parallel across cores, one TenantResult per tenant.
+# Their GA4 calls run as background work unless priority says otherwise. summarize runs in the workers,
+# so it must be a module-level function taking (tenant, start_date, end_date, priority).
+def fan_out(tenant_list, start_date, end_date, max_workers=None, priority=call_queue.BACKGROUND, summarize=summarize_tenant):
+    # Spawned workers start clean instead of inheriting the parent's gRPC channels; each worker
+    # imports the data modules once and keeps its per-tenant clients for every tenant it handles
+    context = multiprocessing.get_context("spawn")
+    max_workers = max_workers or min(len(tenant_list), os.cpu_count() or 1) or 1
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = {executor.submit(summarize, tenant, start_date, end_date, priority): tenant.name for tenant in tenant_list}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. the result could not be sent back)
+                results[name] = TenantResult(name, None, f"{type(e).__name__}: {e}", None)
+
+    return results
@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import namedtuple
+import streamlit as st
+
+# One business served by the app: its GA4 property, Search Console site and service account
+Tenant = namedtuple("Tenant", ["name", "property_id", "site_url", "credentials"])
+
+# Clients are built once per tenant per process and reused for every request after that
+ga4_clients = {}
+search_console_services = {}
+clients_lock = threading.Lock()
+
+# Root folder for per-tenant caches (warehouse, exports)
+CACHE_ROOT = ".cache"
+
+
+# Read the tenant registry from the [tenants.<name>] sections of the Streamlit secrets
+def load_tenants():
+    # Each section has a property_id, an optional site_url and an optional credentials key
+    # naming the secrets section with the service account (defaults to google_service_account)
+    registry = {}
+    for name, config in st.secrets.get("tenants", {}).items():
+        credentials = dict(st.secrets[config.get("credentials", "google_service_account")])
+        registry[name] = Tenant(name, str(config["property_id"]), config.get("site_url"), credentials)
+    return registry
+
+
+def get_tenant(name):
+    registry = load_tenants()
+    if name not in registry:
+        raise ValueError(f"Unknown tenant: {name}")
+    return registry[name]
+
+
+# GA4 Data API client for a tenant
+def ga4_client(tenant):
+    from google.analytics.data_v1beta import BetaAnalyticsDataClient
+
+    with clients_lock:
+        if tenant.name not in ga4_clients:
+            ga4_clients[tenant.name] = BetaAnalyticsDataClient.from_service_account_info(tenant.credentials)
+        return ga4_clients[tenant.name]
+
+
+# Read-only Search Console credentials for a tenant
+def search_console_credentials(tenant):
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_info(
+        tenant.credentials,
+        scopes=['https://www.googleapis.com/auth/webmasters.readonly']
+    )
+
+
+# Search Console service for a tenant
+def search_console_service(tenant):
+    from googleapiclient.discovery import build
+
+    with clients_lock:
+        if tenant.name not in search_console_services:
+            search_console_services[tenant.name] = build('searchconsole', 'v1', credentials=search_console_credentials(tenant))
+        return search_console_services[tenant.name]
+
+
+# Each tenant keeps its caches in its own folder so businesses never share stored data
+def cache_path(tenant, filename):
+    return os.path.join(CACHE_ROOT, "tenants", tenant.name, filename)
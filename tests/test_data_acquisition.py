@@ -0,0 +1,66 @@
+import threading
+import time
+import data_acquisition
+from data_acquisition import acquire_all, acquire_dashboard_data
+
+
+# A fetch that blocks until released, standing in for a source that never answers
+def hang(release):
+    release.wait(10)
+    return "late"
+
+
+def test_timed_out_source_does_not_hold_up_the_others():
+    release = threading.Event()
+    started = time.perf_counter()
+    try:
+        results = acquire_all(
+            {"slow": (hang, (release,), {}), "fast": (lambda x: x * 2, (21,), {})},
+            timeouts={"slow": 0.2, "fast": 5},
+        )
+    finally:
+        release.set()
+
+    assert time.perf_counter() - started < 2
+    assert isinstance(results["slow"].error, TimeoutError)
+    assert results["slow"].data is None
+    assert results["fast"].error is None
+    assert results["fast"].data == 42
+
+
+def test_failing_source_is_captured():
+    def broken():
+        raise RuntimeError("quota exceeded")
+
+    results = acquire_all({"broken": (broken, (), {}), "ok": (lambda: "rows", (), {})})
+
+    assert isinstance(results["broken"].error, RuntimeError)
+    assert results["ok"].data == "rows"
+    assert results["ok"].seconds >= 0
+
+
+def test_dashboard_data_survives_a_timed_out_search_console(monkeypatch):
+    release = threading.Event()
+    calls = {}
+
+    def sync(start_date, end_date, tenant=None, progress=None, refresh=False):
+        calls["ga4"] = (start_date, end_date, refresh)
+        return {"source": "slice"}
+
+    def search_console(start_date, end_date, tenant=None):
+        release.wait(10)
+
+    monkeypatch.setattr(data_acquisition, "sync_dashboard_reports", sync)
+    monkeypatch.setattr(data_acquisition, "fetch_search_console_data", search_console)
+    try:
+        results = acquire_dashboard_data(
+            "2026-09-01", "2026-09-30", sync_dates=("2026-08-02", "2026-09-30"), refresh=True,
+            search_console=True, timeouts={"search_console": 0.2},
+        )
+    finally:
+        release.set()
+
+    assert results["ga4"].data == {"source": "slice"}
+    assert calls["ga4"] == ("2026-08-02", "2026-09-30", True)
+    assert isinstance(results["search_console"].error, TimeoutError)
+    assert "keywords" not in results
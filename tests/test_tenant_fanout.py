@@ -0,0 +1,61 @@
+import os
+import sys
+import precompute_reports
+import tenant_fanout
+from tenant_fanout import TenantResult, fan_out
+from tenants import Tenant
+
+
+# Stand-in for summarize_tenant; module-level so spawned workers can unpickle it
+def fake_summarize(tenant, start_date, end_date, priority):
+    if tenant.name == "broken":
+        raise RuntimeError("worker crashed")
+    return TenantResult(tenant.name, {"pid": os.getpid(), "window": (start_date, end_date)}, None, 0.0)
+
+
+def tenant(name):
+    return Tenant(name, "0", None, None)
+
+
+def test_fan_out_runs_tenants_in_worker_processes():
+    results = fan_out([tenant("acme"), tenant("globex"), tenant("broken")], "2026-09-01", "2026-09-30",
+                      max_workers=2, summarize=fake_summarize)
+
+    assert set(results) == {"acme", "globex", "broken"}
+    for name in ("acme", "globex"):
+        assert results[name].data["pid"] != os.getpid()
+        assert results[name].data["window"] == ("2026-09-01", "2026-09-30")
+
+    # A tenant whose worker raises is reported without taking the others down
+    assert results["broken"].data is None
+    assert "worker crashed" in results["broken"].error
+
+
+def test_precompute_all_tenants_fans_out(monkeypatch, tmp_path):
+    registry = {name: tenant(name) for name in ("acme", "globex", "initech")}
+    calls, written = {}, []
+
+    def fake_fan_out(tenant_list, start_date, end_date, max_workers=None, priority=None, summarize=None):
+        calls.update(tenants=[t.name for t in tenant_list], window=(start_date, end_date), summarize=summarize)
+        return {
+            t.name: TenantResult(t.name, None, "RuntimeError: quota exceeded", 0.0) if t.name == "globex"
+            else TenantResult(t.name, {"tenant": t.name}, None, 0.0)
+            for t in tenant_list
+        }
+
+    monkeypatch.setattr(precompute_reports, "load_tenants", lambda: registry)
+    monkeypatch.setattr(precompute_reports, "fan_out", fake_fan_out)
+    monkeypatch.setattr(precompute_reports, "write_artifacts",
+                        lambda out_dir, report, insights, start, end: written.append((out_dir, report, insights)))
+    monkeypatch.setattr(sys, "argv", ["precompute_reports.py", "--all-tenants", "--skip-insights",
+                                      "--start", "2026-09-01", "--end", "2026-09-30", "--out", str(tmp_path)])
+
+    assert precompute_reports.main() == 1
+
+    assert calls["tenants"] == ["acme", "globex", "initech"]
+    assert calls["window"] == ("2026-09-01", "2026-09-30")
+    assert calls["summarize"] is tenant_fanout.build_tenant_report
+    assert written == [
+        (os.path.join(str(tmp_path), "acme"), {"tenant": "acme"}, {}),
+        (os.path.join(str(tmp_path), "initech"), {"tenant": "initech"}, {}),
+    ]